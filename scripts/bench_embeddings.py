@@ -0,0 +1,91 @@
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sentence_transformers import SentenceTransformer
+from loguru import logger
+
+from src.config import settings
+from src.core.services.embedding_engine import EmbeddingEngine
+
+WORDS_RU = ('договор поставка оплата срок исполнитель заказчик услуги товар цена '
+            'обязательства сторона акт приемка гарантия ответственность').split()
+WORDS_EN = ('contract delivery payment term supplier customer service goods price '
+            'obligation party acceptance warranty liability').split()
+
+
+def make_corpus(n: int, seed: int = 42):
+    rng = random.Random(seed)
+    texts = []
+    for i in range(n):
+        words = WORDS_RU if i % 3 else WORDS_EN
+        kind = rng.random()
+        if kind < 0.35:
+            length = rng.randint(2, 8)
+        elif kind < 0.8:
+            length = rng.randint(30, 120)
+        else:
+            length = rng.randint(200, 350)
+        texts.append('passage: ' + ' '.join(rng.choice(words) for _ in range(length)))
+    return texts
+
+
+def run_baseline(model, texts, batch_size: int):
+    start = time.perf_counter()
+    vectors = model.encode(texts, batch_size=batch_size, show_progress_bar=False)
+    return time.perf_counter() - start, vectors
+
+
+def run_engine(engine, texts):
+    start = time.perf_counter()
+    vectors = engine.encode(texts)
+    return time.perf_counter() - start, vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнение пропускной способности эмбеддинга')
+    parser.add_argument('--n', type=int, default=512)
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--batch-size', type=int, default=32, help='Размер батча базового варианта')
+    parser.add_argument('--token-budget', type=int, default=settings.EMBEDDING_TOKEN_BUDGET)
+    parser.add_argument('--json', type=Path, default=None)
+    args = parser.parse_args()
+
+    logger.info(f'Загрузка {settings.EMBEDDING_MODEL} на {args.device}...')
+    model = SentenceTransformer(settings.EMBEDDING_MODEL, device=args.device)
+    engine = EmbeddingEngine(model, token_budget=args.token_budget)
+
+    texts = make_corpus(args.n)
+    run_engine(engine, texts[:16])
+
+    baseline_time, baseline_vectors = run_baseline(model, texts, args.batch_size)
+    engine_time, engine_vectors = run_engine(engine, texts)
+
+    max_diff = float(abs(baseline_vectors - engine_vectors).max())
+    results = {
+        'model': settings.EMBEDDING_MODEL,
+        'device': args.device,
+        'chunks': len(texts),
+        'baseline': {'batch_size': args.batch_size, 'seconds': round(baseline_time, 2),
+                     'chunks_per_sec': round(len(texts) / baseline_time, 2)},
+        'engine': {'token_budget': args.token_budget, 'seconds': round(engine_time, 2),
+                   'chunks_per_sec': round(len(texts) / engine_time, 2)},
+        'speedup': round(baseline_time / engine_time, 2),
+        'max_abs_diff': max_diff,
+    }
+
+    print(f'\nБазовый encode(batch_size={args.batch_size}): {results["baseline"]["chunks_per_sec"]} чанков/с')
+    print(f'EmbeddingEngine(token_budget={args.token_budget}): {results["engine"]["chunks_per_sec"]} чанков/с')
+    print(f'Ускорение: x{results["speedup"]} | Макс. расхождение векторов: {max_diff:.2e}')
+
+    if args.json:
+        args.json.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
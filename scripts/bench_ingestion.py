@@ -0,0 +1,261 @@
+import argparse
+import json
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from loguru import logger
+
+from src.agents.data_engineer import DataEngineerAgent
+from src.config import settings
+from src.core.services.registry import registry
+from stand_ins import HashEmbedder, StubOCR, start_stub_ollama
+
+WORDS_RU = ('договор поставка оплата срок исполнитель заказчик услуги товар цена обязательства '
+            'сторона акт приемка гарантия ответственность отчет квартал выручка расходы проект').split()
+WORDS_EN = ('contract delivery payment term supplier customer service goods price obligation '
+            'party acceptance warranty liability report quarter revenue expenses project').split()
+FORMATS = ('pdf', 'docx', 'txt', 'png')
+
+
+def make_sections(rng: random.Random, pages: int, russian: bool):
+    words = WORDS_RU if russian else WORDS_EN
+    title = 'Раздел' if russian else 'Section'
+
+    sections = []
+    for page in range(pages):
+        paragraphs = []
+        for _ in range(rng.randint(3, 5)):
+            sentences = [' '.join(rng.choice(words) for _ in range(rng.randint(8, 16))).capitalize() + '.'
+                         for _ in range(rng.randint(3, 6))]
+            paragraphs.append(' '.join(sentences))
+        sections.append((f'{title} {page + 1}', paragraphs))
+    return sections
+
+
+def write_pdf(path: Path, sections):
+    import pymupdf
+
+    doc = pymupdf.open()
+    for title, paragraphs in sections:
+        page = doc.new_page()
+        html = f'<h2>{title}</h2>' + ''.join(f'<p>{p}</p>' for p in paragraphs)
+        page.insert_htmlbox(page.rect + (50, 50, -50, -50), html)
+    doc.save(path)
+    doc.close()
+
+
+def write_docx(path: Path, sections):
+    from docx import Document as DocxDocument
+
+    doc = DocxDocument()
+    for title, paragraphs in sections:
+        doc.add_heading(title, level=2)
+        for paragraph in paragraphs:
+            doc.add_paragraph(paragraph)
+    doc.save(path)
+
+
+def write_txt(path: Path, sections):
+    path.write_text('\n\n'.join(title + '\n\n' + '\n\n'.join(paragraphs) for title, paragraphs in sections),
+                    encoding='utf-8')
+
+
+def write_png(path: Path, sections):
+    from PIL import Image, ImageDraw, ImageFont
+
+    try:
+        font = ImageFont.truetype('DejaVuSans.ttf', 22)
+        lines = [sections[0][0]] + sections[0][1][0].split('. ')
+    except OSError:
+        font = ImageFont.load_default()
+        lines = ['Section 1'] + [' '.join(WORDS_EN[i:i + 6]) for i in range(0, len(WORDS_EN), 6)]
+
+    image = Image.new('RGB', (1240, 60 + 36 * len(lines)), 'white')
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((40, 30 + 36 * i), line, fill='black', font=font)
+    image.save(path)
+
+
+def generate_corpus(directory: Path, docs: int, pages: int, formats, seed: int):
+    writers = {'pdf': write_pdf, 'docx': write_docx, 'txt': write_txt, 'png': write_png}
+    rng = random.Random(seed)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    files = []
+    for i in range(docs):
+        fmt = formats[i % len(formats)]
+        russian = i % 3 != 2
+        path = directory / f'doc_{i:04d}_{"ru" if russian else "en"}.{fmt}'
+        writers[fmt](path, make_sections(rng, 1 if fmt == 'png' else pages, russian))
+        files.append(path)
+
+    logger.info(f'Сгенерирован корпус: {len(files)} файлов в {directory}')
+    return files
+
+
+def configure(workdir: Path, ollama_url: str, with_caches: bool):
+    from src.core.services.query_cache import index_generation
+
+    settings.OLLAMA_BASE_URL = ollama_url
+    settings.VECTOR_BACKEND = 'local'
+    settings.LOCAL_STORE_DIR = workdir / 'vector_store'
+    settings.FILE_MANIFEST_PATH = workdir / 'cache' / 'manifest.sqlite'
+    settings.SUMMARY_CACHE_PATH = workdir / 'cache' / 'summaries.sqlite'
+    settings.EMBEDDING_CACHE_DIR = workdir / 'cache' / 'embeddings'
+    settings.INDEX_GENERATION_PATH = workdir / 'cache' / 'index_generation'
+    index_generation.path = settings.INDEX_GENERATION_PATH
+
+    settings.FILE_MANIFEST_ENABLED = with_caches
+    settings.SUMMARY_CACHE_ENABLED = with_caches
+    settings.EMBEDDING_CACHE_ENABLED = with_caches
+
+
+def peak_rss_mb():
+    import resource
+
+    divider = 2 ** 20 if sys.platform == 'darwin' else 2 ** 10
+    return {
+        'self': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divider, 1),
+        'children': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / divider, 1),
+    }
+
+
+def git_revision():
+    try:
+        sha = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return f'{sha}-dirty' if dirty else sha
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_pass(agent, corpus_dir: Path, files, mode: str, workers: int):
+    agent.timer.reset()
+    start = time.perf_counter()
+
+    if mode == 'pipeline':
+        results = agent.process_directory(corpus_dir, workers=workers)
+    else:
+        results = {'processed': [], 'skipped': [], 'errors': []}
+        for file_path in files:
+            try:
+                result = agent.process_file(str(file_path), stream=mode == 'stream')
+            except Exception as e:
+                logger.error(f'Ошибка обработки {file_path.name}: {e}')
+                result = {'status': 'error', 'file': str(file_path), 'error': str(e)}
+
+            key = {'success': 'processed', 'skipped': 'skipped'}.get(result['status'], 'errors')
+            results[key].append(result)
+
+    seconds = time.perf_counter() - start
+    processed = len(results['processed'])
+    return {
+        'seconds': round(seconds, 3),
+        'processed': processed,
+        'skipped': len(results['skipped']),
+        'errors': len(results['errors']),
+        'docs_per_sec': round(processed / seconds, 2) if seconds else 0,
+        'chunks': sum(r.get('chunk_processed', 0) for r in results['processed']),
+        'stages': agent.timer.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сквозной замер загрузки документов на локальных заглушках')
+    parser.add_argument('--docs', type=int, default=40)
+    parser.add_argument('--pages', type=int, default=5, help='Страниц/разделов на документ')
+    parser.add_argument('--formats', nargs='+', default=list(FORMATS), choices=FORMATS)
+    parser.add_argument('--corpus', type=Path, default=None, help='Готовый корпус вместо генерации')
+    parser.add_argument('--mode', choices=('serial', 'stream', 'pipeline'), default='serial')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--embedder', choices=('mock', 'real'), default='mock')
+    parser.add_argument('--ocr', choices=('mock', 'real'), default='mock')
+    parser.add_argument('--llm-latency', type=float, default=0.05, help='Задержка заглушки Ollama, с')
+    parser.add_argument('--with-caches', action='store_true', help='Включить манифест и кэши')
+    parser.add_argument('--passes', type=int, default=1, help='Повторные проходы по тому же корпусу')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', type=Path, default=None)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logger.remove()
+        logger.add(sys.stderr, level='WARNING')
+
+    formats = list(args.formats)
+    if args.mode == 'pipeline' and args.ocr == 'mock' and 'png' in formats and not args.corpus:
+        # парсинг в конвейере идет в дочерних процессах, подмена OCR туда не попадает
+        logger.warning('В режиме pipeline с --ocr mock изображения исключены из корпуса')
+        formats.remove('png')
+
+    with tempfile.TemporaryDirectory(prefix='bench_ingestion_') as tmp:
+        workdir = Path(tmp)
+        corpus_dir = args.corpus or workdir / 'corpus'
+        if args.corpus:
+            files = DataEngineerAgent._collect_files(corpus_dir)
+        else:
+            files = generate_corpus(corpus_dir, args.docs, args.pages, formats, args.seed)
+
+        server, ollama_url = start_stub_ollama(args.llm_latency)
+        configure(workdir, ollama_url, args.with_caches)
+
+        stand_ins = {}
+        if args.embedder == 'mock':
+            stand_ins['embedder'] = HashEmbedder()
+        if args.ocr == 'mock':
+            stand_ins['ocr'] = StubOCR()
+        if stand_ins:
+            registry.override(**stand_ins)
+
+        agent = DataEngineerAgent()
+        passes = []
+        try:
+            for i in range(args.passes):
+                logger.warning(f'Проход {i + 1}/{args.passes}: {len(files)} файлов, режим {args.mode}')
+                passes.append(run_pass(agent, corpus_dir, files, args.mode, args.workers))
+            store_stats = registry.get_vector_store().get_document_stats()
+            rss = peak_rss_mb()
+        finally:
+            registry.release()
+            server.shutdown()
+
+    report = {
+        'git': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+        'files': len(files),
+        'store': store_stats,
+        'peak_rss_mb': rss,
+        'passes': passes,
+    }
+
+    for i, result in enumerate(passes):
+        print(f'\nПроход {i + 1}: {result["processed"]} обработано, {result["skipped"]} пропущено, '
+              f'{result["errors"]} ошибок за {result["seconds"]} с ({result["docs_per_sec"]} док/с, '
+              f'{result["chunks"]} чанков)')
+        # стена - время, когда стадия была занята хотя бы одним потоком, сумма - по всем потокам
+        print(f'{"стадия":<10} {"стена, с":>9} {"сумма, с":>9} {"элементы":>9} {"вызовы":>7} {"элем/с":>9}')
+        for stage in ('parse', 'hash', 'summarize', 'chunk', 'embed', 'upsert'):
+            stats = result['stages'].get(stage)
+            if stats:
+                print(f'{stage:<10} {stats["wall_seconds"]:>9} {stats["seconds"]:>9} {stats["items"]:>9} '
+                      f'{stats["calls"]:>7} {stats["items_per_sec"]:>9}')
+    print(f'\nПиковый RSS, МБ: {report["peak_rss_mb"]["self"]} (процесс), '
+          f'{report["peak_rss_mb"]["children"]} (дочерние процессы)')
+
+    if args.json:
+        args.json.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+ENTRY_POINTS = [
+    'src.config',
+    'src.core.document_loader',
+    'src.core.vector_store',
+    'src.core.services.summarizer',
+    'src.agents.data_engineer',
+    'src.agents.analytical_qa',
+]
+
+
+def measure_import(module: str, repeats: int):
+    wall_times = []
+    heaviest = []
+
+    for _ in range(repeats):
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=ROOT, capture_output=True, text=True
+        )
+        wall_times.append(time.perf_counter() - start)
+
+        if proc.returncode != 0:
+            return {
+                'module': module,
+                'error': proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'unknown'
+            }
+
+        heaviest = parse_importtime(proc.stderr)
+
+    return {
+        'module': module,
+        'wall_ms_min': round(min(wall_times) * 1000, 1),
+        'wall_ms_median': round(sorted(wall_times)[len(wall_times) // 2] * 1000, 1),
+        'top_imports': heaviest[:5]
+    }
+
+
+def parse_importtime(stderr: str):
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+
+        _, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        package = name.strip().split('.')[0]
+        if package in ('src', 'site', 'encodings'):
+            continue
+        packages[package] = max(packages.get(package, 0), int(cumulative_us))
+
+    return [
+        {'module': package, 'cumulative_ms': round(cumulative_us / 1000, 1)}
+        for package, cumulative_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Стоимость импорта точек входа Documind')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--json', type=Path, default=None, help='Сохранить результаты в JSON')
+    parser.add_argument('modules', nargs='*', default=ENTRY_POINTS)
+    args = parser.parse_args()
+
+    results = [measure_import(module, args.repeats) for module in args.modules]
+
+    print(f'{"Модуль":<35} {"min, мс":>10} {"median, мс":>12}  Самые тяжёлые импорты')
+    for result in results:
+        if 'error' in result:
+            print(f'{result["module"]:<35} ошибка: {result["error"]}')
+            continue
+        heavy = ', '.join(f'{row["module"]} ({row["cumulative_ms"]} мс)' for row in result['top_imports'][:3])
+        print(f'{result["module"]:<35} {result["wall_ms_min"]:>10} {result["wall_ms_median"]:>12}  {heavy}')
+
+    if args.json:
+        args.json.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding='utf-8')
+        print(f'\nРезультаты сохранены в {args.json}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+import weaviate
+from weaviate.classes.config import Configure, Property, DataType
+from loguru import logger
+
+from src.core.vector_store import build_vector_index_config, default_index_config
+
+PRESETS = {
+    'hnsw': {'type': 'hnsw'},
+    'hnsw_tuned': {'type': 'hnsw', 'ef': 128, 'ef_construction': 256, 'max_connections': 48},
+    'hnsw_pq': {'type': 'hnsw', 'compression': 'pq'},
+    'hnsw_bq': {'type': 'hnsw', 'compression': 'bq'},
+    'hnsw_sq': {'type': 'hnsw', 'compression': 'sq'},
+    'flat': {'type': 'flat'},
+    'flat_bq': {'type': 'flat', 'compression': 'bq'},
+}
+
+
+def load_vectors(client, npy_path: Path = None, max_vectors: int = None) -> np.ndarray:
+    if npy_path:
+        vectors = np.load(npy_path).astype(np.float32)
+        return vectors[:max_vectors] if max_vectors else vectors
+
+    collection = client.collections.get('DocumentChunk')
+    vectors = []
+    for obj in collection.iterator(include_vector=True):
+        vector = obj.vector.get('default') if isinstance(obj.vector, dict) else obj.vector
+        if vector:
+            vectors.append(vector)
+        if max_vectors and len(vectors) >= max_vectors:
+            break
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def ground_truth(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    corpus_norm = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+    queries_norm = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    scores = queries_norm @ corpus_norm.T
+    top = np.argpartition(-scores, k, axis=1)[:, :k]
+    return top
+
+
+def estimate_memory_mb(config: dict, n: int, dim: int) -> float:
+    compression = config.get('compression')
+    if compression == 'pq':
+        vector_bytes = config.get('pq_segments') or dim // 4
+    elif compression == 'bq':
+        vector_bytes = dim / 8
+    elif compression == 'sq':
+        vector_bytes = dim
+    else:
+        vector_bytes = dim * 4
+
+    graph_bytes = 0
+    if config['type'] != 'flat':
+        graph_bytes = config['max_connections'] * 2 * 8
+
+    return round(n * (vector_bytes + graph_bytes) / 2 ** 20, 1)
+
+
+def run_preset(client, name: str, overrides: dict, corpus: np.ndarray,
+               queries: np.ndarray, truth: np.ndarray, k: int) -> dict:
+    config = {**default_index_config(), 'compression': None, **overrides}
+    if config.get('compression') in ('pq', 'sq'):
+        config['training_limit'] = min(config['training_limit'], len(corpus))
+
+    collection_name = f'IndexBench_{name}'
+    if client.collections.exists(collection_name):
+        client.collections.delete(collection_name)
+
+    collection = client.collections.create(
+        name=collection_name,
+        vectorizer_config=Configure.Vectorizer.none(),
+        vector_index_config=build_vector_index_config(config),
+        properties=[Property(name='idx', data_type=DataType.INT)]
+    )
+
+    try:
+        start = time.perf_counter()
+        with collection.batch.fixed_size(batch_size=256) as batch:
+            for i, vector in enumerate(corpus):
+                batch.add_object(properties={'idx': i}, vector=vector.tolist())
+        insert_time = time.perf_counter() - start
+
+        if collection.batch.failed_objects:
+            logger.warning(f'{name}: не загружено {len(collection.batch.failed_objects)} объектов')
+
+        latencies, hits = [], 0
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            response = collection.query.near_vector(near_vector=query.tolist(), limit=k,
+                                                    return_properties=['idx'])
+            latencies.append((time.perf_counter() - start) * 1000)
+            found = {obj.properties['idx'] for obj in response.objects}
+            hits += len(found & set(expected.tolist()))
+
+        return {
+            'config': config,
+            'insert_per_sec': round(len(corpus) / insert_time, 1),
+            f'recall@{k}': round(hits / (len(queries) * k), 4),
+            'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+            'p95_ms': round(float(np.percentile(latencies, 95)), 2),
+            'est_memory_mb': estimate_memory_mb(config, len(corpus), corpus.shape[1]),
+        }
+
+    finally:
+        client.collections.delete(collection_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнение конфигураций векторного индекса')
+    parser.add_argument('--npy', type=Path, default=None, help='Векторы из .npy вместо DocumentChunk')
+    parser.add_argument('--max-vectors', type=int, default=None)
+    parser.add_argument('--queries', type=int, default=200, help='Число отложенных векторов-запросов')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--presets', nargs='+', default=list(PRESETS), choices=list(PRESETS))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', type=Path, default=None)
+    args = parser.parse_args()
+
+    client = weaviate.connect_to_local(port=8080, grpc_port=50051)
+    try:
+        vectors = load_vectors(client, args.npy, args.max_vectors)
+        if len(vectors) <= args.queries + args.k:
+            logger.error(f'Недостаточно векторов для замера: {len(vectors)}')
+            return
+
+        order = np.random.default_rng(args.seed).permutation(len(vectors))
+        queries, corpus = vectors[order[:args.queries]], vectors[order[args.queries:]]
+        truth = ground_truth(corpus, queries, args.k)
+        logger.info(f'Корпус: {len(corpus)} векторов x {corpus.shape[1]}, запросов: {len(queries)}')
+
+        results = {}
+        for name in args.presets:
+            logger.info(f'Замер конфигурации {name}...')
+            results[name] = run_preset(client, name, PRESETS[name], corpus, queries, truth, args.k)
+
+    finally:
+        client.close()
+
+    print(f'\n{"конфигурация":<12} {"recall@" + str(args.k):>10} {"p50, мс":>9} {"p95, мс":>9} '
+          f'{"память, МБ":>11} {"вставка/с":>10}')
+    for name, result in results.items():
+        print(f'{name:<12} {result[f"recall@{args.k}"]:>10} {result["p50_ms"]:>9} {result["p95_ms"]:>9} '
+              f'{result["est_memory_mb"]:>11} {result["insert_per_sec"]:>10}')
+
+    if args.json:
+        args.json.write_text(json.dumps({'corpus': len(corpus), 'dim': int(corpus.shape[1]), 'k': args.k,
+                                         'results': results}, ensure_ascii=False, indent=2),
+                             encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,331 @@
+import argparse
+import json
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+import numpy as np
+from loguru import logger
+
+from src.config import settings
+from src.core.services.registry import registry
+from stand_ins import HashEmbedder, start_stub_ollama
+from bench_ingestion import WORDS_RU, WORDS_EN, make_sections, git_revision
+
+STAGES = ('embed', 'search', 'context', 'llm', 'total', 'client')
+QUESTIONS = ('Какой {} указан в документе?', 'Что сказано про {} и {}?', 'Кто отвечает за {}?',
+             'What is the {} for the {}?', 'Перечисли условия: {}, {}, {}')
+
+
+def load_queries(path: Path):
+    queries = []
+    for line in path.read_text(encoding='utf-8').splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('{'):
+            line = json.loads(line).get('query', '')
+        if line:
+            queries.append(line)
+    return queries
+
+
+def synthetic_queries(unique: int, seed: int):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(unique):
+        template = rng.choice(QUESTIONS)
+        words = WORDS_EN if template.startswith('What') else WORDS_RU
+        queries.append(template.format(*(rng.choice(words) for _ in range(template.count('{}')))))
+    return queries
+
+
+def seed_local_store(workdir: Path, docs: int, seed: int, tenant: str = None):
+    from src.agents.data_engineer import chunk_uuids
+    from src.core.services.query_cache import index_generation
+
+    settings.VECTOR_BACKEND = 'local'
+    settings.LOCAL_STORE_DIR = workdir / 'vector_store'
+    settings.INDEX_GENERATION_PATH = workdir / 'index_generation'
+    settings.EMBEDDING_CACHE_DIR = workdir / 'embeddings'
+    index_generation.path = settings.INDEX_GENERATION_PATH
+
+    rng = random.Random(seed)
+    store = registry.get_vector_store()
+    engine = registry.get_embedding_engine()
+
+    total = 0
+    for i in range(docs):
+        russian = i % 3 != 2
+        chunks = []
+        for page, (title, paragraphs) in enumerate(make_sections(rng, 3, russian), start=1):
+            for paragraph in [title] + paragraphs:
+                chunks.append({
+                    'content': paragraph,
+                    'page_number': page,
+                    'chunk_index': len(chunks),
+                    'element_type': 'Title' if paragraph == title else 'NarrativeText',
+                    'chunk_hash': store.calculate_content_hash(paragraph),
+                })
+
+        doc_uuid = store.create_document_object(
+            filename=f'doc_{i:04d}_{"ru" if russian else "en"}.txt',
+            summary=' '.join(chunks[1]['content'].split()[:30]),
+            content_hash=store.calculate_content_hash(f'seed-{seed}-{i}'),
+            doc_type='txt',
+            total_pages=3,
+            total_chunks=len(chunks),
+            tenant=tenant
+        )
+        vectors = engine.encode_passages([f'passage: {chunk["content"]}' for chunk in chunks])
+        store.upsert_chunks_linked(chunks, vectors, doc_uuid, tenant, chunk_uuids(doc_uuid, chunks))
+        total += len(chunks)
+
+    logger.warning(f'Локальное хранилище заполнено: {docs} документов, {total} чанков')
+
+
+def configure_llm(mode: str, latency: float):
+    if mode == 'mock':
+        from langchain_core.language_models import FakeListChatModel
+
+        registry.override(llm=FakeListChatModel(responses=['Ответ тестовой модели по найденному контексту.']))
+        return None
+
+    if mode == 'stub':
+        server, url = start_stub_ollama(latency)
+        settings.OLLAMA_BASE_URL = url
+        return server
+
+    return None
+
+
+def answer_status(result: dict) -> str:
+    from src.agents.analytical_qa import NOT_FOUND_ANSWER
+
+    if 'error' in result:
+        return 'error'
+    answer = (result.get('answer') or '').strip()
+    if not answer:
+        return 'error'
+    # ответ-заглушка без контекста не нагружает LLM и искажает задержки, считаем его деградацией
+    if answer == NOT_FOUND_ANSWER:
+        return 'degraded'
+    return 'ok'
+
+
+def make_inproc_caller(tenant: str = None):
+    from src.agents.analytical_qa import AnalyticalQAAgent
+
+    agent = AnalyticalQAAgent()
+
+    def call(query: str):
+        result = agent.answer(query, tenant=tenant)
+        return result.get('timings', {}), answer_status(result), bool(result.get('cached'))
+
+    return call
+
+
+def make_http_caller(base_url: str, tenant: str = None, timeout: float = 120):
+    url = base_url.rstrip('/') + '/ask'
+
+    def call(query: str):
+        body = json.dumps({'query': query, 'tenant': tenant}, ensure_ascii=False).encode('utf-8')
+        request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                result = json.loads(response.read())
+        except urllib.error.HTTPError:
+            return {}, 'error', False
+        return result.get('timings', {}), answer_status(result), bool(result.get('cached'))
+
+    return call
+
+
+class LoadRecorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {stage: [] for stage in STAGES}
+        self.queue_ms = []
+        self.errors = 0
+        self.degraded = 0
+        self.cached = 0
+        self.requests = 0
+
+    def run(self, call, query: str, scheduled: float = None):
+        start = time.perf_counter()
+        try:
+            timings, status, cached = call(query)
+        except Exception as e:
+            logger.error(f'Ошибка запроса "{query}": {e}')
+            timings, status, cached = {}, 'error', False
+        end = time.perf_counter()
+        failed = status != 'ok'
+
+        with self._lock:
+            self.requests += 1
+            self.errors += failed
+            self.degraded += status == 'degraded'
+            self.cached += cached
+            if scheduled is not None:
+                self.queue_ms.append((start - scheduled) * 1000)
+            # в открытой модели задержка считается от запланированного момента, с учетом очереди
+            self.samples['client'].append((end - (scheduled if scheduled is not None else start)) * 1000)
+            if not failed:
+                for stage, ms in timings.items():
+                    if stage in self.samples:
+                        self.samples[stage].append(ms)
+
+    def report(self, seconds: float):
+        stages = {}
+        for stage, values in self.samples.items():
+            if not values:
+                continue
+            stages[stage] = {
+                'count': len(values),
+                'p50_ms': round(float(np.percentile(values, 50)), 2),
+                'p95_ms': round(float(np.percentile(values, 95)), 2),
+                'p99_ms': round(float(np.percentile(values, 99)), 2),
+                'max_ms': round(float(max(values)), 2),
+            }
+
+        return {
+            'requests': self.requests,
+            'seconds': round(seconds, 3),
+            'throughput_rps': round(self.requests / seconds, 2) if seconds else 0,
+            'error_rate': round(self.errors / self.requests, 4) if self.requests else 0,
+            'degraded_rate': round(self.degraded / self.requests, 4) if self.requests else 0,
+            'cached_rate': round(self.cached / self.requests, 4) if self.requests else 0,
+            'queue_p95_ms': round(float(np.percentile(self.queue_ms, 95)), 2) if self.queue_ms else None,
+            'stages': stages,
+        }
+
+
+def run_closed(call, queries, requests: int, concurrency: int, recorder: LoadRecorder):
+    lock = threading.Lock()
+    issued = iter(range(requests))
+
+    def worker():
+        while True:
+            with lock:
+                i = next(issued, None)
+            if i is None:
+                return
+            recorder.run(call, queries[i % len(queries)])
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run_open(call, queries, requests: int, qps: float, max_inflight: int, recorder: LoadRecorder):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_inflight) as pool:
+        for i in range(requests):
+            scheduled = start + i / qps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(recorder.run, call, queries[i % len(queries)], scheduled)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест AnalyticalQAAgent.answer')
+    parser.add_argument('--target', default='inproc', help='inproc или базовый URL API, например http://localhost:8000')
+    parser.add_argument('--queries', type=Path, default=None, help='Лог запросов: строки текста или JSONL с полем query')
+    parser.add_argument('--unique', type=int, default=100, help='Число уникальных синтетических запросов')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=8, help='Замкнутая модель: число параллельных клиентов')
+    parser.add_argument('--qps', type=float, default=None, help='Открытая модель: целевая частота запросов')
+    parser.add_argument('--max-inflight', type=int, default=64)
+    parser.add_argument('--llm', choices=('real', 'mock', 'stub'), default='real',
+                        help='mock - FakeListChatModel без сети, stub - заглушка Ollama с задержкой')
+    parser.add_argument('--llm-latency', type=float, default=0.5)
+    parser.add_argument('--embedder', choices=('real', 'mock'), default='real')
+    parser.add_argument('--seed-docs', type=int, default=0,
+                        help='Заполнить временное локальное хранилище синтетическими документами')
+    parser.add_argument('--no-cache', action='store_true', help='Отключить кэши запросов и ответов агента')
+    parser.add_argument('--tenant', default=None)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', type=Path, default=None)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logger.remove()
+        logger.add(sys.stderr, level='WARNING')
+
+    queries = load_queries(args.queries) if args.queries else synthetic_queries(args.unique, args.seed)
+    random.Random(args.seed).shuffle(queries)
+
+    server = None
+    with tempfile.TemporaryDirectory(prefix='load_test_qa_') as tmp:
+        if args.target == 'inproc':
+            if args.no_cache:
+                settings.QUERY_CACHE_SIZE = 0
+                settings.ANSWER_CACHE_SIZE = 0
+            if args.embedder == 'mock':
+                registry.override(embedder=HashEmbedder())
+            if args.seed_docs:
+                seed_local_store(Path(tmp), args.seed_docs, args.seed, args.tenant)
+            server = configure_llm(args.llm, args.llm_latency)
+            call = make_inproc_caller(args.tenant)
+        else:
+            # этапы на стороне сервера приходят в поле timings ответа /ask
+            call = make_http_caller(args.target, args.tenant)
+
+        try:
+            if args.warmup:
+                run_closed(call, queries, args.warmup, min(args.concurrency, args.warmup), LoadRecorder())
+
+            recorder = LoadRecorder()
+            start = time.perf_counter()
+            if args.qps:
+                run_open(call, queries, args.requests, args.qps, args.max_inflight, recorder)
+            else:
+                run_closed(call, queries, args.requests, args.concurrency, recorder)
+            result = recorder.report(time.perf_counter() - start)
+        finally:
+            if args.target == 'inproc':
+                registry.release()
+            if server is not None:
+                server.shutdown()
+
+    load = f'{args.qps} qps' if args.qps else f'{args.concurrency} клиентов'
+    print(f'\n{args.target}, {load}: {result["requests"]} запросов за {result["seconds"]} с, '
+          f'{result["throughput_rps"]} rps, ошибки {result["error_rate"]:.2%} '
+          f'(из них без контекста {result["degraded_rate"]:.2%}), '
+          f'из кэша {result["cached_rate"]:.2%}')
+    if result['queue_p95_ms'] is not None:
+        print(f'Ожидание в очереди клиента p95: {result["queue_p95_ms"]} мс')
+    print(f'{"стадия":<8} {"n":>6} {"p50, мс":>9} {"p95, мс":>9} {"p99, мс":>9} {"max, мс":>9}')
+    for stage in STAGES:
+        stats = result['stages'].get(stage)
+        if stats:
+            print(f'{stage:<8} {stats["count"]:>6} {stats["p50_ms"]:>9} {stats["p95_ms"]:>9} '
+                  f'{stats["p99_ms"]:>9} {stats["max_ms"]:>9}')
+
+    if args.json:
+        report = {
+            'git': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'config': {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+            'queries': len(queries),
+            **result,
+        }
+        args.json.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
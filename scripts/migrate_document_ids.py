@@ -0,0 +1,31 @@
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+
+from src.core.vector_store import VectorStoreManager
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Разовое заполнение document_id у чанков, загруженных до его появления')
+    parser.add_argument('--tenant', action='append', default=None, help='Тенант, по умолчанию все')
+    parser.add_argument('--page-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    store = VectorStoreManager()
+    try:
+        tenants = args.tenant or list(store.list_tenants()) or [None]
+        total = 0
+        for tenant in tenants:
+            logger.info(f'Заполнение document_id, тенант: {tenant or "по умолчанию"}')
+            total += store.backfill_document_ids(tenant, args.page_size)
+        logger.success(f'Миграция завершена, обновлено {total} чанков')
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
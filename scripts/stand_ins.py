@@ -0,0 +1,138 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import List, Tuple
+
+import numpy as np
+
+TOKEN_RE = re.compile(r'\w+|[^\w\s]')
+
+
+class WhitespaceTokenizer:
+    def __call__(self, text, add_special_tokens: bool = True, truncation: bool = False,
+                 max_length: int = None, return_offsets_mapping: bool = False, **kwargs):
+        texts = [text] if isinstance(text, str) else text
+        input_ids, offset_mapping = [], []
+
+        for item in texts:
+            spans = [match.span() for match in TOKEN_RE.finditer(item)]
+            if add_special_tokens:
+                spans = [(0, 0)] + spans + [(0, 0)]
+            if truncation and max_length:
+                spans = spans[:max_length]
+
+            input_ids.append([hash(item[start:end]) % 30000 for start, end in spans])
+            offset_mapping.append(spans)
+
+        result = {'input_ids': input_ids}
+        if return_offsets_mapping:
+            result['offset_mapping'] = offset_mapping
+
+        if isinstance(text, str):
+            return {key: value[0] for key, value in result.items()}
+        return result
+
+
+class HashEmbedder:
+    def __init__(self, dim: int = 1024, max_seq_length: int = 512, delay_per_text: float = 0.0):
+        self.dim = dim
+        self.max_seq_length = max_seq_length
+        self.delay_per_text = delay_per_text
+        self.tokenizer = WhitespaceTokenizer()
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, texts: List[str], batch_size: int = 32, convert_to_numpy: bool = True,
+               show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        if self.delay_per_text:
+            time.sleep(self.delay_per_text * len(texts))
+
+        vectors = np.empty((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+            vector = np.random.default_rng(seed).standard_normal(self.dim, dtype=np.float32)
+            vectors[i] = vector / np.linalg.norm(vector)
+        return vectors
+
+
+class StubOCR:
+    def __init__(self, text: str = 'Распознанный текст изображения. Recognized image text.'):
+        self.text = text
+        self.pages = 0
+        self.seconds = 0.0
+
+    def readtext_batch(self, images: list) -> List[List[Tuple[list, str]]]:
+        self.pages += len(images)
+        bbox = [(0, 0), (100, 0), (100, 20), (0, 20)]
+        return [[(bbox, self.text)] for _ in images]
+
+    def stats(self):
+        return {'pages': self.pages, 'seconds': self.seconds}
+
+
+def _stub_answer(messages: list) -> str:
+    prompt = next((m.get('content', '') for m in reversed(messages) if m.get('role') == 'user'), '')
+    words = prompt.split()
+    return 'Краткое содержание: ' + ' '.join(words[:40])
+
+
+def start_stub_ollama(latency: float = 0.0, chunk_words: int = 8) -> Tuple[ThreadingHTTPServer, str]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, body: bytes, content_type: str = 'application/json'):
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.startswith('/api/tags'):
+                self._send(b'{"models": []}')
+            else:
+                self.send_error(404)
+
+        def do_POST(self):
+            if not self.path.startswith('/api/chat'):
+                self.send_error(404)
+                return
+
+            length = int(self.headers.get('Content-Length') or 0)
+            request = json.loads(self.rfile.read(length) or b'{}')
+            model = request.get('model', 'stub')
+            answer = _stub_answer(request.get('messages', []))
+            time.sleep(latency)
+
+            created_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+            final = {'model': model, 'created_at': created_at,
+                     'message': {'role': 'assistant', 'content': ''},
+                     'done': True, 'done_reason': 'stop',
+                     'prompt_eval_count': 0, 'eval_count': len(answer.split())}
+
+            if not request.get('stream', True):
+                final['message']['content'] = answer
+                self._send(json.dumps(final, ensure_ascii=False).encode('utf-8'))
+                return
+
+            words = answer.split(' ')
+            lines = []
+            for start in range(0, len(words), chunk_words):
+                part = ' '.join(words[start:start + chunk_words]) + ' '
+                lines.append({'model': model, 'created_at': created_at,
+                              'message': {'role': 'assistant', 'content': part}, 'done': False})
+            lines.append(final)
+            body = ''.join(json.dumps(line, ensure_ascii=False) + '\n' for line in lines)
+            self._send(body.encode('utf-8'), 'application/x-ndjson')
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
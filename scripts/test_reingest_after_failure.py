@@ -0,0 +1,121 @@
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+
+from src.agents.data_engineer import DataEngineerAgent
+from src.config import settings
+from src.core.services.query_cache import index_generation
+from src.core.services.registry import registry
+from stand_ins import HashEmbedder
+
+PARAGRAPHS = [
+    'Договор поставки заключен между заказчиком и исполнителем на срок один год.',
+    'Оплата производится в течение десяти рабочих дней после подписания акта приемки.',
+    'Гарантия на поставленный товар составляет двенадцать месяцев с даты поставки.',
+]
+
+
+class StubSummarizer:
+    def generate_summary(self, full_text, content_hash=None):
+        return full_text[:100]
+
+    def generate_summary_stream(self, parts, content_hash=None):
+        return ' '.join(parts)[:100]
+
+
+class FailingEngine:
+    def encode_passages(self, texts):
+        raise RuntimeError('эмбеддер недоступен')
+
+
+def setup(workdir: Path):
+    settings.VECTOR_BACKEND = 'local'
+    settings.LOCAL_STORE_DIR = workdir / 'vector_store'
+    settings.FILE_MANIFEST_ENABLED = True
+    settings.FILE_MANIFEST_PATH = workdir / 'manifest.sqlite'
+    settings.EMBEDDING_CACHE_ENABLED = False
+    settings.INDEX_GENERATION_PATH = workdir / 'index_generation'
+    settings.CHUNK_SIZE = 20
+    index_generation.path = settings.INDEX_GENERATION_PATH
+
+    registry.release()
+    registry.override(embedder=HashEmbedder(), summarizer=StubSummarizer())
+
+
+def ingest_with_failure(agent: DataEngineerAgent, file_path: Path, stream: bool):
+    registry.override(embedding_engine=FailingEngine())
+    try:
+        agent.process_file(file_path, stream=stream)
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError('Ожидалась ошибка эмбеддинга')
+    finally:
+        registry.override(embedder=HashEmbedder())
+
+
+def stored_contents(doc_uuid: str):
+    store = registry.get_vector_store()
+    uuids = [chunk['uuid'] for chunk in store.get_document_chunks(doc_uuid)]
+    with store._lock:
+        rows = store._db.execute(
+            f'SELECT content FROM chunks WHERE uuid IN ({", ".join("?" * len(uuids))})', uuids
+        ).fetchall()
+    return sorted(row[0] for row in rows)
+
+
+def check_modified_file(stream: bool):
+    with tempfile.TemporaryDirectory() as tmp:
+        setup(Path(tmp))
+        agent = DataEngineerAgent()
+        file_path = Path(tmp) / 'contract.txt'
+
+        file_path.write_text('\n\n'.join(PARAGRAPHS), encoding='utf-8')
+        first = agent.process_file(file_path, stream=stream)
+        assert first['status'] == 'success', first
+
+        changed = PARAGRAPHS[:2] + ['Гарантия на товар составляет двадцать четыре месяца.']
+        file_path.write_text('\n\n'.join(changed), encoding='utf-8')
+        ingest_with_failure(agent, file_path, stream)
+
+        document = registry.get_vector_store().get_document(first['doc_uuid'])
+        assert document['content_hash'] == first['content_hash'], 'хэш обновлен до записи чанков'
+
+        second = agent.process_file(file_path, stream=stream)
+        assert second['status'] == 'success', second
+        assert second['mode'] == 'incremental', second
+        assert stored_contents(first['doc_uuid']) == sorted(changed)
+
+        registry.release()
+
+
+def check_new_file(stream: bool):
+    with tempfile.TemporaryDirectory() as tmp:
+        setup(Path(tmp))
+        agent = DataEngineerAgent()
+        file_path = Path(tmp) / 'contract.txt'
+        file_path.write_text('\n\n'.join(PARAGRAPHS), encoding='utf-8')
+
+        ingest_with_failure(agent, file_path, stream)
+        assert registry.get_vector_store().get_document_stats()['total_documents'] == 0
+
+        result = agent.process_file(file_path, stream=stream)
+        assert result['status'] == 'success', result
+        assert stored_contents(result['doc_uuid']) == sorted(PARAGRAPHS)
+
+        registry.release()
+
+
+def test_reingest_after_embed_failure():
+    for stream in (False, True):
+        check_modified_file(stream)
+        check_new_file(stream)
+
+
+if __name__ == '__main__':
+    test_reingest_after_embed_failure()
+    logger.success('Повторная загрузка после сбоя эмбеддинга работает')
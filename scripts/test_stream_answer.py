@@ -0,0 +1,29 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.agents.analytical_qa import AnalyticalQAAgent
+
+
+def main():
+    qa = AnalyticalQAAgent()
+    question = 'Какие условия по срокам и оплате? О чем в целом документ?'
+
+    print(f'User: {question}\nDocumind: ', end='', flush=True)
+    for event in qa.answer_stream(question):
+        if event['type'] == 'token':
+            print(event['content'], end='', flush=True)
+        elif event['type'] == 'sources':
+            sources = event['sources']
+        elif event['type'] == 'timing':
+            print(f'[{event["stage"]}: {event["ms"]} мс] ', end='', flush=True)
+        elif event['type'] == 'error':
+            print(f'\nОшибка: {event["error"]}')
+            return
+
+    print(f'\nИсточники: {sources}')
+
+
+if __name__ == '__main__':
+    main()
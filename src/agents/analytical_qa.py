@@ -1,25 +1,38 @@
+import asyncio
 import os
-from typing import List, Dict, Any
-from sentence_transformers import SentenceTransformer
-from langchain_ollama import ChatOllama
+import time
+from typing import List, Dict, Any, Iterator, AsyncIterator, Optional
 from langchain.schema import HumanMessage, SystemMessage
 from loguru import logger
 
-from src.core.vector_store import VectorStoreManager
+from src.core.vector_store_base import BaseVectorStore
+from src.core.services.registry import registry
+from src.core.services.query_cache import TTLLRUCache, index_generation, normalize_query
 from src.config import settings
 
 
+NOT_FOUND_ANSWER = 'К сожалению, в базе данных не найдено информации по вашему запросу'
+
+
 class AnalyticalQAAgent:
-    def __init__(self, model_name='gemma3:4b'):
-        self.llm = ChatOllama(
-            model=model_name,
-            temperature=.1,
-            base_url='http://localhost:11434'
-        )
+    def __init__(self, model_name: str = None):
+        self.model_name = model_name or settings.LLM_MODEL
+        self.query_cache = TTLLRUCache(settings.QUERY_CACHE_SIZE, settings.QUERY_CACHE_TTL,
+                                       generation=index_generation)
+        self.answer_cache = TTLLRUCache(settings.ANSWER_CACHE_SIZE, settings.ANSWER_CACHE_TTL,
+                                        generation=index_generation)
+
+    @property
+    def llm(self):
+        return registry.get_llm(self.model_name, temperature=.1)
 
-        self.embedder = SentenceTransformer('intfloat/multilingual-e5-large')
+    @property
+    def embedder(self):
+        return registry.get_embedder()
 
-        self.vector_store = VectorStoreManager()
+    @property
+    def vector_store(self) -> BaseVectorStore:
+        return registry.get_vector_store()
 
     def _format_smart_context(self, chunks: List[Dict[str, Any]]) -> str:
         formatted_text = ""
@@ -48,23 +61,26 @@ class AnalyticalQAAgent:
 
         return formatted_text
 
-    def answer(self, query: str) -> Dict[str, Any]:
-        logger.info(f'Вопрос пользователя: {query}')
+    def _embed_query(self, normalized_query: str, query: str, query_embedding=None):
+        if query_embedding is not None:
+            self.query_cache.put(normalized_query, query_embedding)
+            return query_embedding
 
-        query_embedding = self.embedder.encode(f'query: {query}')
+        query_embedding = self.query_cache.get(normalized_query)
+        if query_embedding is None:
+            query_embedding = registry.get_embedding_engine().encode_queries([query])[0]
+            self.query_cache.put(normalized_query, query_embedding)
+        return query_embedding
 
-        relevant_chunks = self.vector_store.search(
+    def _search(self, query_embedding, tenant: Optional[str] = None) -> List[Dict[str, Any]]:
+        return self.vector_store.search(
             vector=query_embedding.tolist(),
             limit=5,
-            include_summary=True
+            include_summary=True,
+            tenant=tenant
         )
 
-        if not relevant_chunks:
-            return {
-                'answer': 'К сожалению, в базе данных не найдено информации по вашему запросу',
-                'sources': []
-            }
-
+    def _build_messages(self, query: str, relevant_chunks: List[Dict[str, Any]]):
         context_str = self._format_smart_context(relevant_chunks)
 
         system_prompt = ('Ты - умный корпоративный ассистент Documind. '
@@ -80,26 +96,205 @@ class AnalyticalQAAgent:
                        f'КОНТЕКСТ:\n{context_str}\n\n'
                        f'ОТВЕТ:')
 
+        return [
+            SystemMessage(content=system_prompt),
+            HumanMessage(content=user_prompt)
+        ]
+
+    @staticmethod
+    def _sources(relevant_chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [
+            {'file': c['filename'], 'page': c['page_number']}
+            for c in relevant_chunks
+        ]
+
+    def cached_query_embedding(self, query: str):
+        return self.query_cache.get(normalize_query(query))
+
+    def answer(self, query: str, query_embedding=None, tenant: Optional[str] = None) -> Dict[str, Any]:
+        logger.info(f'Вопрос пользователя: {query}')
+        start = time.perf_counter()
+        timings = {}
+        normalized_query = normalize_query(query)
+
+        stage_start = time.perf_counter()
+        query_embedding = self._embed_query(normalized_query, query, query_embedding)
+        timings['embed'] = _elapsed_ms(stage_start)
+
+        stage_start = time.perf_counter()
+        relevant_chunks = self._search(query_embedding, tenant)
+        timings['search'] = _elapsed_ms(stage_start)
+
+        if not relevant_chunks:
+            return {
+                'answer': NOT_FOUND_ANSWER,
+                'sources': [],
+                'timings': {**timings, 'total': _elapsed_ms(start)}
+            }
+
+        answer_key = (tenant, normalized_query, frozenset(c['uuid'] for c in relevant_chunks))
+        cached_answer = self.answer_cache.get(answer_key)
+        if cached_answer is not None:
+            logger.info('Ответ найден в кэше')
+            return {**cached_answer, 'cached': True, 'timings': {**timings, 'total': _elapsed_ms(start)}}
+
         try:
+            stage_start = time.perf_counter()
+            messages = self._build_messages(query, relevant_chunks)
+            timings['context'] = _elapsed_ms(stage_start)
+
             logger.info('Генерация ответа через LLM')
-            messages = [
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=user_prompt)
-            ]
+            stage_start = time.perf_counter()
             response = self.llm.invoke(messages)
+            timings['llm'] = _elapsed_ms(stage_start)
 
-            return {
+            result = {
                 'answer': response.content,
-                'sources': [
-                    {'file': c['filename'], 'page': c['page_number']}
-                    for c in relevant_chunks
-                ]
+                'sources': self._sources(relevant_chunks)
             }
+            if result['answer'].strip():
+                self.answer_cache.put(answer_key, result)
+            return {**result, 'timings': {**timings, 'total': _elapsed_ms(start)}}
 
         except Exception as e:
             logger.error(f'Ошибка LLM: {e}')
             return {
                 'answer': 'Произошла ошибка при генерации ответа',
                 'error': str(e),
-                'sources': []
+                'sources': [],
+                'timings': {**timings, 'total': _elapsed_ms(start)}
             }
+
+    def answer_stream(self, query: str, query_embedding=None,
+                      tenant: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        logger.info(f'Вопрос пользователя (стриминг): {query}')
+        start = time.perf_counter()
+        normalized_query = normalize_query(query)
+
+        stage_start = time.perf_counter()
+        query_embedding = self._embed_query(normalized_query, query, query_embedding)
+        yield _timing_event('embed', stage_start)
+
+        stage_start = time.perf_counter()
+        relevant_chunks = self._search(query_embedding, tenant)
+        yield _timing_event('search', stage_start)
+
+        prepared = self._prepare_stream(normalized_query, relevant_chunks, tenant)
+        yield from prepared['events']
+        if prepared['done']:
+            return
+
+        tokens = []
+        done_reason = None
+        try:
+            for chunk in self.llm.stream(self._build_messages(query, relevant_chunks)):
+                if not tokens:
+                    yield _timing_event('first_token', start)
+                tokens.append(chunk.content)
+                done_reason = _done_reason(chunk, done_reason)
+                yield {'type': 'token', 'content': chunk.content}
+        except Exception as e:
+            logger.error(f'Ошибка LLM: {e}')
+            yield {'type': 'error', 'error': str(e)}
+            return
+
+        yield self._finish_stream(prepared['answer_key'], relevant_chunks, tokens, start, done_reason)
+
+    async def astream_answer(self, query: str, query_embedding=None,
+                             tenant: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        logger.info(f'Вопрос пользователя (async стриминг): {query}')
+        start = time.perf_counter()
+        normalized_query = normalize_query(query)
+
+        stage_start = time.perf_counter()
+        query_embedding = await asyncio.to_thread(self._embed_query, normalized_query, query, query_embedding)
+        yield _timing_event('embed', stage_start)
+
+        stage_start = time.perf_counter()
+        relevant_chunks = await asyncio.to_thread(self._search, query_embedding, tenant)
+        yield _timing_event('search', stage_start)
+
+        prepared = self._prepare_stream(normalized_query, relevant_chunks, tenant)
+        for event in prepared['events']:
+            yield event
+        if prepared['done']:
+            return
+
+        tokens = []
+        done_reason = None
+        try:
+            async for chunk in self.llm.astream(self._build_messages(query, relevant_chunks)):
+                if not tokens:
+                    yield _timing_event('first_token', start)
+                tokens.append(chunk.content)
+                done_reason = _done_reason(chunk, done_reason)
+                yield {'type': 'token', 'content': chunk.content}
+        except Exception as e:
+            logger.error(f'Ошибка LLM: {e}')
+            yield {'type': 'error', 'error': str(e)}
+            return
+
+        yield self._finish_stream(prepared['answer_key'], relevant_chunks, tokens, start, done_reason)
+
+    def _prepare_stream(self, normalized_query: str, relevant_chunks: List[Dict[str, Any]],
+                        tenant: Optional[str] = None) -> Dict[str, Any]:
+        if not relevant_chunks:
+            return {
+                'done': True,
+                'events': [
+                    {'type': 'sources', 'sources': []},
+                    {'type': 'token', 'content': NOT_FOUND_ANSWER},
+                    {'type': 'done', 'answer': NOT_FOUND_ANSWER, 'cached': False}
+                ]
+            }
+
+        events = [{'type': 'sources', 'sources': self._sources(relevant_chunks)}]
+        answer_key = (tenant, normalized_query, frozenset(c['uuid'] for c in relevant_chunks))
+
+        cached_answer = self.answer_cache.get(answer_key)
+        if cached_answer is not None:
+            logger.info('Ответ найден в кэше')
+            events += [
+                {'type': 'token', 'content': cached_answer['answer']},
+                {'type': 'done', 'answer': cached_answer['answer'], 'cached': True}
+            ]
+            return {'done': True, 'events': events}
+
+        return {'done': False, 'events': events, 'answer_key': answer_key}
+
+    def _finish_stream(self, answer_key, relevant_chunks: List[Dict[str, Any]],
+                       tokens: List[str], start: float, done_reason: Optional[str] = None) -> Dict[str, Any]:
+        answer = ''.join(tokens)
+        # оборванный по лимиту или пустой ответ не кэшируем, иначе он будет отдаваться до смены индекса
+        if not answer.strip():
+            logger.warning('LLM вернула пустой ответ, в кэш не сохраняем')
+        elif done_reason not in (None, 'stop'):
+            logger.warning(f'Генерация ответа прервана ({done_reason}), в кэш не сохраняем')
+        else:
+            self.answer_cache.put(answer_key, {
+                'answer': answer,
+                'sources': self._sources(relevant_chunks)
+            })
+        return {
+            'type': 'done',
+            'answer': answer,
+            'cached': False,
+            'total_ms': _elapsed_ms(start)
+        }
+
+
+def _elapsed_ms(stage_start: float) -> float:
+    return round((time.perf_counter() - stage_start) * 1000, 1)
+
+
+def _done_reason(chunk, current: Optional[str] = None) -> Optional[str]:
+    metadata = getattr(chunk, 'response_metadata', None) or {}
+    return metadata.get('done_reason') or metadata.get('finish_reason') or current
+
+
+def _timing_event(stage: str, stage_start: float) -> Dict[str, Any]:
+    return {
+        'type': 'timing',
+        'stage': stage,
+        'ms': _elapsed_ms(stage_start)
+    }
@@ -1,20 +1,95 @@
-from sentence_transformers import SentenceTransformer
-from src.core.document_loader import DocumentLoader
-from src.core.services.summarizer import summarizer
-from src.core.vector_store import VectorStoreManager
+import tempfile
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+from src.core.document_loader import DocumentLoader, Document
+from src.core.services.registry import registry
+from src.core.services.stage_timer import StageTimer
+from src.core.vector_store_base import BaseVectorStore, ContentHasher
+from src.config import settings
 from loguru import logger
 import json
 
 
+SUPPORTED_EXTENSIONS = ['.pdf', '.docx', '.jpg', '.jpeg', '.png', '.txt']
+# пока чанки не записаны, документ хранит хэш с префиксом, чтобы сбой не превратил повтор в дубликат
+PENDING_HASH_PREFIX = 'pending:'
+POSITION_FIELDS = ('chunk_index', 'page_number', 'element_type')
+
+
+class ChunkDiff:
+    def __init__(self, stored_chunks: List[Dict[str, Any]]):
+        self._stored = {chunk['uuid']: chunk for chunk in stored_chunks}
+        self.kept = 0
+        self.moved: Dict[str, Dict[str, Any]] = {}
+
+    def match(self, chunk_uuid: str, chunk: Dict[str, Any]) -> bool:
+        stored = self._stored.pop(chunk_uuid, None)
+        if stored is None:
+            return False
+
+        position = {field: chunk[field] for field in POSITION_FIELDS}
+        if any(stored.get(field) != value for field, value in position.items()):
+            self.moved[chunk_uuid] = position
+        self.kept += 1
+        return True
+
+    def stale(self) -> List[str]:
+        return list(self._stored)
+
+
+def chunk_uuids(doc_uuid: str, chunks: List[Dict[str, Any]], occurrences: Counter = None) -> List[str]:
+    occurrences = Counter() if occurrences is None else occurrences
+    uuids = []
+    for chunk in chunks:
+        chunk_hash = chunk['chunk_hash']
+        uuids.append(BaseVectorStore.chunk_uuid(doc_uuid, chunk_hash, occurrences[chunk_hash]))
+        occurrences[chunk_hash] += 1
+    return uuids
+
+
 class DataEngineerAgent:
     def __init__(self):
-        self.embedder = SentenceTransformer('intfloat/multilingual-e5-large')
-        self.vector_store = VectorStoreManager()
+        self.timer = StageTimer()
+        self._in_flight = set()
+        self._in_flight_lock = threading.Lock()
 
-    def process_file(self, file_path, forse_reprocess: bool = False):
+    @property
+    def embedder(self):
+        return registry.get_embedder()
+
+    @property
+    def embedding_engine(self):
+        return registry.get_embedding_engine()
+
+    @property
+    def vector_store(self) -> BaseVectorStore:
+        return registry.get_vector_store()
+
+    def process_file(self, file_path, forse_reprocess: bool = False, stream: bool = False,
+                     tenant: Optional[str] = None, filename: Optional[str] = None):
         logger.info(f'Агент Data Engineer начал обработку: {file_path}')
 
-        doc = DocumentLoader.from_file(file_path)
+        manifest_entry = self._check_manifest(file_path, forse_reprocess, tenant)
+        if manifest_entry['status'] == 'unchanged':
+            return self._manifest_skip(file_path, manifest_entry)
+
+        if stream:
+            result = self._process_file_streaming(file_path, forse_reprocess, tenant,
+                                                  manifest_entry.get('doc_uuid'), filename)
+        else:
+            result = self._process_file(file_path, forse_reprocess, tenant,
+                                        manifest_entry.get('doc_uuid'), filename)
+
+        self._remember(file_path, result, tenant, manifest_entry.get('raw_hash'))
+        return result
+
+    def _process_file(self, file_path, forse_reprocess: bool = False, tenant: Optional[str] = None,
+                      previous_uuid: Optional[str] = None, filename: Optional[str] = None):
+        with self.timer.stage('parse'):
+            doc = DocumentLoader.from_file(file_path, filename=filename)
         if not doc:
             logger.error(f'Не удалось загрузить документ {file_path}')
             return {
@@ -22,12 +97,233 @@ class DataEngineerAgent:
                 'message': 'Не удалось загрузить файл'
             }
 
+        job = self._prepare_document(doc, forse_reprocess, tenant, previous_uuid)
+        if job['status'] != 'pending':
+            return job
+
+        try:
+            vectors = self._embed_texts(job['texts_to_embed'])
+            return self._store_chunks(job, vectors)
+        except Exception:
+            self._discard(job)
+            raise
+
+    def _check_manifest(self, file_path, forse_reprocess: bool = False,
+                        tenant: Optional[str] = None) -> Dict[str, Any]:
+        manifest = registry.get_file_manifest()
+        if manifest is None:
+            return {'status': 'new'}
+
+        try:
+            manifest_entry = manifest.lookup(file_path, tenant)
+        except OSError as e:
+            logger.warning(f'Не удалось проверить файл по манифесту {file_path}: {e}')
+            return {'status': 'new'}
+
+        if manifest_entry['status'] == 'unchanged':
+            document = self.vector_store.get_document(manifest_entry['doc_uuid'], tenant)
+            if document is None:
+                logger.warning(f'Документ {manifest_entry["doc_uuid"]} из манифеста не найден в хранилище, '
+                               f'загружаем {Path(file_path).name} заново')
+                manifest.forget_document(manifest_entry['doc_uuid'])
+                return {'status': 'new', 'raw_hash': manifest_entry['raw_hash']}
+            if forse_reprocess or document.get('content_hash') != manifest_entry['content_hash']:
+                manifest_entry['status'] = 'modified'
+        return manifest_entry
+
+    @staticmethod
+    def _manifest_skip(file_path, manifest_entry: Dict[str, Any]) -> Dict[str, Any]:
+        logger.info(f'Файл {Path(file_path).name} не изменился с прошлой загрузки. Пропускаем обработку.')
+        return {
+            'status': 'skipped',
+            'reason': 'unchanged',
+            'document': Path(file_path).name,
+            'existing_uuid': manifest_entry['doc_uuid'],
+            'content_hash': manifest_entry['content_hash']
+        }
+
+    def _remember(self, file_path, result: Dict[str, Any], tenant: Optional[str] = None,
+                  raw_hash: Optional[str] = None):
+        manifest = registry.get_file_manifest()
+        if manifest is None:
+            return
+
+        if result.get('status') == 'success':
+            doc_uuid = result.get('doc_uuid')
+        elif result.get('reason') == 'duplicate':
+            doc_uuid = result.get('existing_uuid')
+        else:
+            return
+
+        if not doc_uuid or not result.get('content_hash'):
+            return
+
+        try:
+            manifest.record(file_path, result['content_hash'], doc_uuid, tenant, raw_hash)
+        except OSError as e:
+            logger.warning(f'Не удалось записать файл в манифест {file_path}: {e}')
+
+    def _prepare_document(self, doc: Document, forse_reprocess: bool = False,
+                          tenant: Optional[str] = None, previous_uuid: Optional[str] = None) -> Dict[str, Any]:
         full_text = doc.get_full_text()
-        content_hash = VectorStoreManager.calculate_content_hash(full_text)
+        with self.timer.stage('hash'):
+            content_hash = BaseVectorStore.calculate_content_hash(full_text)
 
         logger.info(f'Content hash: {content_hash[:16]}...')
 
-        existing_doc = self.vector_store.document_exists(content_hash)
+        claim = self._claim(doc.filename, content_hash, tenant)
+        if isinstance(claim, dict):
+            return claim
+
+        try:
+            job = self._build_job(doc, full_text, content_hash, forse_reprocess, tenant, previous_uuid)
+        except Exception:
+            self._release(claim)
+            raise
+
+        if job['status'] == 'pending':
+            job['claim'] = claim
+        else:
+            self._release(claim)
+        return job
+
+    def _build_job(self, doc: Document, full_text: str, content_hash: str, forse_reprocess: bool = False,
+                   tenant: Optional[str] = None, previous_uuid: Optional[str] = None) -> Dict[str, Any]:
+        duplicate = self._check_existing(doc.filename, content_hash, forse_reprocess, tenant)
+        if duplicate:
+            return duplicate
+
+        previous = self._find_previous(doc.filename, previous_uuid, forse_reprocess, tenant)
+
+        logger.info("Генерация саммари документа...")
+        try:
+            with self.timer.stage('summarize'):
+                summary = registry.get_summarizer().generate_summary(full_text, content_hash)
+            logger.success(f'Саммари готов')
+        except Exception as e:
+            logger.error(f'Ошибка генерации саммари: {e}')
+            summary = ''
+
+        logger.info('Подготовка чанков для векторизации')
+        chunks_for_db = []
+        texts_to_embed = []
+
+        with self.timer.stage('chunk', len(doc.chunks)):
+            for idx, chunk in enumerate(registry.get_chunk_assembler().assemble(doc.chunks)):
+                texts_to_embed.append(f'passage: {chunk.text}')
+
+                chunks_for_db.append({
+                    'content': chunk.text,
+                    'page_number': chunk.page_number,
+                    'chunk_index': idx,
+                    'element_type': chunk.element_type,
+                    'chunk_hash': BaseVectorStore.calculate_content_hash(chunk.text),
+                })
+
+        logger.info(f'Собрано {len(chunks_for_db)} чанков из {len(doc.chunks)} элементов')
+        doc_stats = doc.get_statistic()
+
+        if previous:
+            diff = ChunkDiff(self.vector_store.get_document_chunks(previous['uuid'], tenant))
+            new_chunks, new_uuids = [], []
+            for chunk, chunk_uuid in zip(chunks_for_db, chunk_uuids(previous['uuid'], chunks_for_db)):
+                if not diff.match(chunk_uuid, chunk):
+                    new_chunks.append(chunk)
+                    new_uuids.append(chunk_uuid)
+
+            logger.info(f'Инкрементальное обновление: {len(new_chunks)} новых, {diff.kept} без изменений, '
+                        f'{len(diff.stale())} к удалению')
+
+            return {
+                'status': 'pending',
+                'mode': 'incremental',
+                'document': doc.filename,
+                'doc_uuid': previous['uuid'],
+                'tenant': tenant,
+                'content_hash': content_hash,
+                'total_pages': doc_stats['total_pages'],
+                'chunks_for_db': new_chunks,
+                'chunk_uuids': new_uuids,
+                'texts_to_embed': [f'passage: {chunk["content"]}' for chunk in new_chunks],
+                'stale_chunks': diff.stale(),
+                'moved_chunks': diff.moved,
+                'document_properties': {
+                    'summary': summary,
+                    'content_hash': content_hash,
+                    'file_size': doc.metadata.get('file_size', 0),
+                    'total_pages': doc_stats['total_pages'],
+                    'total_chunks': len(chunks_for_db)
+                }
+            }
+
+        logger.info('Создание записи документа в БД')
+
+        doc_uuid = self.vector_store.create_document_object(
+            filename = doc.filename,
+            summary=summary,
+            content_hash=PENDING_HASH_PREFIX + content_hash,
+            doc_type=doc.file_type.value,
+            file_size=doc.metadata.get('file_size', 0),
+            total_pages=doc_stats['total_pages'],
+            total_chunks=0,
+            tenant=tenant
+        )
+
+        return {
+            'status': 'pending',
+            'mode': 'full',
+            'document': doc.filename,
+            'doc_uuid': doc_uuid,
+            'tenant': tenant,
+            'content_hash': content_hash,
+            'total_pages': doc_stats['total_pages'],
+            'chunks_for_db': chunks_for_db,
+            'texts_to_embed': texts_to_embed,
+            'document_properties': {
+                'content_hash': content_hash,
+                'total_chunks': len(chunks_for_db)
+            }
+        }
+
+    def _claim(self, filename: str, content_hash: str, tenant: Optional[str] = None):
+        claim = (tenant, content_hash)
+        with self._in_flight_lock:
+            if claim not in self._in_flight:
+                self._in_flight.add(claim)
+                return claim
+
+        logger.info(f'Документ с тем же содержимым уже загружается, пропускаем {filename}')
+        return {
+            'status': 'skipped',
+            'reason': 'in_progress',
+            'document': filename,
+            'content_hash': content_hash
+        }
+
+    def _release(self, claim):
+        with self._in_flight_lock:
+            self._in_flight.discard(claim)
+
+    def _discard(self, job: Dict[str, Any]):
+        self._release(job.get('claim'))
+        if job.get('mode') != 'full':
+            return
+
+        logger.warning(f'Загрузка {job["document"]} не завершена, удаляем незаполненный документ {job["doc_uuid"]}')
+        try:
+            self._delete_document(job['doc_uuid'], job.get('tenant'))
+        except Exception as e:
+            logger.error(f'Не удалось удалить документ {job["doc_uuid"]}: {e}')
+
+    def _delete_document(self, doc_uuid: str, tenant: Optional[str] = None):
+        self.vector_store.delete_document(doc_uuid, tenant)
+        manifest = registry.get_file_manifest()
+        if manifest is not None:
+            manifest.forget_document(doc_uuid)
+
+    def _check_existing(self, filename: str, content_hash: str, forse_reprocess: bool = False,
+                        tenant: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        existing_doc = self.vector_store.document_exists(content_hash, tenant)
 
         if existing_doc and not forse_reprocess:
             logger.info(f'Документ уже существует в БД\n'
@@ -38,70 +334,242 @@ class DataEngineerAgent:
             return {
                 'status': 'skipped',
                 'reason': 'duplicate',
-                'document': doc.filename,
+                'document': filename,
                 'existing_uuid': existing_doc['uuid'],
-                'existring_filename': existing_doc['filename']
+                'existring_filename': existing_doc['filename'],
+                'content_hash': content_hash
             }
 
         if existing_doc and forse_reprocess:
             logger.info(f'Принудительная переобработка документа {existing_doc["filename"]}')
-            self.vector_store.delete_document(existing_doc["uuid"])
+            self._delete_document(existing_doc["uuid"], tenant)
+
+        return None
+
+    def _find_previous(self, filename: str, previous_uuid: Optional[str] = None,
+                       forse_reprocess: bool = False, tenant: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        # прошлую версию знает только манифест: совпадение одного имени файла еще не значит, что это тот же документ
+        previous = self.vector_store.get_document(previous_uuid, tenant) if previous_uuid else None
+
+        if previous and forse_reprocess:
+            logger.info(f'Принудительная переобработка: удаляем прошлую версию {filename}')
+            self._delete_document(previous['uuid'], tenant)
+            return None
+
+        if previous:
+            logger.info(f'Найдена прошлая версия документа {filename} | UUID: {previous["uuid"]}')
+        return previous
+
+    def _process_file_streaming(self, file_path, forse_reprocess: bool = False,
+                                tenant: Optional[str] = None, previous_uuid: Optional[str] = None,
+                                filename: Optional[str] = None):
+        try:
+            doc = DocumentLoader.from_file_streaming(file_path, filename=filename)
+        except Exception as e:
+            logger.error(f'Не удалось загрузить документ {file_path}: {e}')
+            return {
+                'status': 'error',
+                'message': 'Не удалось загрузить файл'
+            }
+
+        hasher = ContentHasher()
+        total_chunks = 0
+
+        def hashed(chunks):
+            for chunk in chunks:
+                hasher.update(chunk.text)
+                yield chunk
+
+        with tempfile.TemporaryFile('w+', encoding='utf-8') as spool:
+            try:
+                # при потоковом чтении парсинг, хэширование и сборка чанков идут одним проходом
+                with self.timer.stage('parse'):
+                    for chunk in registry.get_chunk_assembler().assemble(hashed(doc.iter_chunks())):
+                        spool.write(json.dumps({
+                            'content': chunk.text,
+                            'page_number': chunk.page_number,
+                            'element_type': chunk.element_type,
+                            'chunk_hash': BaseVectorStore.calculate_content_hash(chunk.text),
+                        }, ensure_ascii=False) + '\n')
+                        total_chunks += 1
+            except Exception as e:
+                logger.error(f'Ошибка загрузки {doc.filename}: {e}')
+                return {
+                    'status': 'error',
+                    'message': 'Не удалось загрузить файл'
+                }
+
+            content_hash = hasher.hexdigest()
+            total_pages = doc.metadata['pages']
+            logger.info(f'Документ прочитан потоково: {total_chunks} чанков, {total_pages} страниц')
+            logger.info(f'Content hash: {content_hash[:16]}...')
+
+            claim = self._claim(doc.filename, content_hash, tenant)
+            if isinstance(claim, dict):
+                return claim
+
+            try:
+                return self._stream_document(doc, spool, content_hash, total_chunks, total_pages,
+                                             forse_reprocess, tenant, previous_uuid)
+            finally:
+                self._release(claim)
+
+    def _stream_document(self, doc, spool, content_hash: str, total_chunks: int, total_pages: int,
+                         forse_reprocess: bool = False, tenant: Optional[str] = None,
+                         previous_uuid: Optional[str] = None) -> Dict[str, Any]:
+        duplicate = self._check_existing(doc.filename, content_hash, forse_reprocess, tenant)
+        if duplicate:
+            return duplicate
+
+        previous = self._find_previous(doc.filename, previous_uuid, forse_reprocess, tenant)
 
         logger.info("Генерация саммари документа...")
         try:
-            summary = summarizer.generate_summary(full_text)
+            spool.seek(0)
+            with self.timer.stage('summarize'):
+                summary = registry.get_summarizer().generate_summary_stream(
+                    (json.loads(line)['content'] for line in spool), content_hash
+                )
             logger.success(f'Саммари готов')
         except Exception as e:
             logger.error(f'Ошибка генерации саммари: {e}')
             summary = ''
 
-        logger.info('Создание записи документа в БД')
-        doc_stats = doc.get_statistic()
+        if previous:
+            doc_uuid = previous['uuid']
+            diff = ChunkDiff(self.vector_store.get_document_chunks(doc_uuid, tenant))
+            document_properties = {
+                'summary': summary,
+                'file_size': doc.metadata.get('file_size', 0),
+                'total_pages': total_pages
+            }
+        else:
+            diff = None
+            doc_uuid = self.vector_store.create_document_object(
+                filename=doc.filename,
+                summary=summary,
+                content_hash=PENDING_HASH_PREFIX + content_hash,
+                doc_type=doc.file_type.value,
+                file_size=doc.metadata.get('file_size', 0),
+                total_pages=total_pages,
+                total_chunks=0,
+                tenant=tenant
+            )
+            document_properties = {}
 
-        doc_uuid = self.vector_store.create_document_object(
-            filename = doc.filename,
-            summary=summary,
-            content_hash=content_hash,
-            doc_type=doc.file_type.value,
-            file_size=doc.metadata.get('file_size', 0),
-            total_pages=doc_stats['total_pages'],
-            total_chunks=doc_stats['total_chunks']
-        )
+        try:
+            spool.seek(0)
+            window, window_uuids = [], []
+            occurrences = Counter()
+            chunk_processed = 0
+            for idx, line in enumerate(spool):
+                chunk = json.loads(line)
+                chunk['chunk_index'] = idx
+                chunk_uuid = chunk_uuids(doc_uuid, [chunk], occurrences)[0]
+                if diff and diff.match(chunk_uuid, chunk):
+                    continue
 
-        logger.info('Подготовка чанков для векторизации')
-        chunks_for_db = []
-        texts_to_embed = []
+                window.append(chunk)
+                window_uuids.append(chunk_uuid)
+                chunk_processed += 1
 
-        for idx, chunk in enumerate(doc.chunks):
-            texts_to_embed.append(f'passage: {chunk.text}')
+                if len(window) >= settings.STREAM_WINDOW_SIZE:
+                    self._store_window(window, doc_uuid, tenant, window_uuids)
+                    window, window_uuids = [], []
 
-            chunks_for_db.append({
-                'content': chunk.text,
-                'page_number': chunk.page_number,
-                'chunk_index': idx,
-                'element_type': chunk.element_type,
-            })
+            if window:
+                self._store_window(window, doc_uuid, tenant, window_uuids)
 
+            stale_chunks = diff.stale() if diff else []
+            with self.timer.stage('upsert', 0):
+                if stale_chunks:
+                    self.vector_store.delete_chunks(stale_chunks, tenant)
+                if diff and diff.moved:
+                    self.vector_store.update_chunk_positions(diff.moved, tenant)
+                self.vector_store.update_document_object(
+                    doc_uuid, tenant,
+                    content_hash=content_hash,
+                    total_chunks=total_chunks,
+                    **document_properties
+                )
+        except Exception:
+            self._discard({'mode': 'incremental' if diff else 'full', 'doc_uuid': doc_uuid,
+                           'tenant': tenant, 'document': doc.filename})
+            raise
+
+        return {
+            'status': 'success',
+            'mode': 'incremental' if diff else 'full',
+            'document': doc.filename,
+            'doc_uuid': doc_uuid,
+            'chunk_processed': chunk_processed,
+            'chunks_removed': len(stale_chunks),
+            'total_pages': total_pages,
+            'content_hash': content_hash
+        }
+
+    def _store_window(self, chunks_for_db: List[Dict[str, Any]], doc_uuid: str,
+                      tenant: Optional[str] = None, window_uuids: List[str] = None):
+        vectors = self._embed_texts([f'passage: {chunk["content"]}' for chunk in chunks_for_db])
+        with self.timer.stage('upsert', len(chunks_for_db)):
+            self._upsert(chunks_for_db, vectors, doc_uuid, tenant, window_uuids)
+
+    def _upsert(self, chunks_for_db: List[Dict[str, Any]], vectors, doc_uuid: str,
+                tenant: Optional[str] = None, uuids: List[str] = None):
+        stats = self.vector_store.upsert_chunks_linked(chunks_for_db, vectors, doc_uuid, tenant, uuids)
+        if stats and stats.get('failed'):
+            raise RuntimeError(f'Не загружено {stats["failed"]} из {len(chunks_for_db)} чанков '
+                               f'документа {doc_uuid}')
+
+    def _embed_texts(self, texts_to_embed: List[str]):
         logger.info(f'Генерация эмбеддингов для {len(texts_to_embed)} чанков...')
         try:
-            vectors = self.embedder.encode(texts_to_embed, show_progress_bar=True, batch_size=32)
+            with self.timer.stage('embed', len(texts_to_embed)):
+                vectors = self.embedding_engine.encode_passages(texts_to_embed)
             logger.success(f'Эмбеддинги сгенерированы: {vectors.shape}')
+            return vectors
         except Exception as e:
             logger.error(f'Ошибка генерации эмбеддингов: {e}')
             raise e
 
-        self.vector_store.upsert_chunks_linked(chunks_for_db, vectors.tolist(), doc_uuid)
+    def _store_chunks(self, job: Dict[str, Any], vectors) -> Dict[str, Any]:
+        try:
+            self._write_job(job, vectors)
+        finally:
+            self._release(job.get('claim'))
 
         return {
             'status': 'success',
-            'document': doc.filename,
-            'chunk_processed': len(chunks_for_db),
-            'total_pages': doc_stats['total_pages'],
-            'content_hash': content_hash
+            'mode': job.get('mode', 'full'),
+            'document': job['document'],
+            'doc_uuid': job['doc_uuid'],
+            'chunk_processed': len(job['chunks_for_db']),
+            'chunks_removed': len(job.get('stale_chunks', [])),
+            'total_pages': job['total_pages'],
+            'content_hash': job['content_hash']
         }
 
-    def process_directory(self, directory_path, force_reprocess: bool =False):
-        from pathlib import Path
+    def _write_job(self, job: Dict[str, Any], vectors):
+        with self.timer.stage('upsert', len(job['chunks_for_db'])):
+            if job['chunks_for_db']:
+                self._upsert(job['chunks_for_db'], vectors, job['doc_uuid'],
+                             job.get('tenant'), job.get('chunk_uuids'))
+            if job.get('stale_chunks'):
+                self.vector_store.delete_chunks(job['stale_chunks'], job.get('tenant'))
+            if job.get('moved_chunks'):
+                self.vector_store.update_chunk_positions(job['moved_chunks'], job.get('tenant'))
+            self.vector_store.update_document_object(job['doc_uuid'], job.get('tenant'),
+                                                     **job['document_properties'])
+
+    @staticmethod
+    def _collect_files(directory: Path) -> List[Path]:
+        files = []
+        for ext in SUPPORTED_EXTENSIONS:
+            files.extend(directory.glob(f'**/*{ext}'))
+        return files
+
+    def process_directory(self, directory_path, force_reprocess: bool =False,
+                          workers: Optional[int] = None, tenant: Optional[str] = None):
         logger.info(f'Начало обработки директории {directory_path}')
 
         directory = Path(directory_path)
@@ -113,41 +581,52 @@ class DataEngineerAgent:
                 'message': 'Директория не найдена'
             }
 
+        files = self._collect_files(directory)
+        workers = workers or 1
+
+        if workers > 1 and len(files) > 1:
+            from src.agents.ingestion_pipeline import IngestionPipeline
+            results = IngestionPipeline(self, workers=workers).run(files, force_reprocess, tenant)
+        else:
+            results = self._process_files_serial(files, force_reprocess, tenant)
+
+        logger.info(f'\n{"="*30}')
+        logger.info(f'Директория {directory_path} обработана:')
+        logger.info(f'Успешно: {len(results["processed"])} | '
+                    f'Пропущено: {len(results["skipped"])} | '
+                    f'Ошибки: {len(results["errors"])}')
+
+        return results
+
+    def _process_files_serial(self, files: List[Path], force_reprocess: bool = False,
+                              tenant: Optional[str] = None):
         results = {
             'processed': [],
             'skipped': [],
             'errors': []
         }
 
-        for ext in ['.pdf', '.docx', '.jpg', '.jpeg', '.png', '.txt']:
-            for file_path in directory.glob(f'**/*{ext}'):
-                logger.info(f'Обработка файла: {file_path.name}')
-
-                try:
-                    result = self.process_file(str(file_path), force_reprocess)
+        for file_path in files:
+            logger.info(f'Обработка файла: {file_path.name}')
 
-                    if result['status'] == 'success':
-                        results['processed'].append(result)
-                    elif result['status'] == 'skipped':
-                        results['skipped'].append(result)
-                    else:
-                        results['errors'].append(result)
+            try:
+                result = self.process_file(str(file_path), force_reprocess, tenant=tenant)
 
-                except Exception as e:
-                    logger.error(f'Ошибка обработки {file_path.name}: {e}')
-                    results['errors'].append({
-                        'file': str(file_path),
-                        'error': str(e)
-                    })
+                if result['status'] == 'success':
+                    results['processed'].append(result)
+                elif result['status'] == 'skipped':
+                    results['skipped'].append(result)
+                else:
+                    results['errors'].append(result)
 
-
-        logger.info(f'\n{"="*30}')
-        logger.info(f'Директория {directory_path} обработана:')
-        logger.info(f'Успешно: {len(results["processed"])} | '
-                    f'Пропущено: {len(results["skipped"])} | '
-                    f'Ошибки: {len(results["errors"])}')
+            except Exception as e:
+                logger.error(f'Ошибка обработки {file_path.name}: {e}')
+                results['errors'].append({
+                    'file': str(file_path),
+                    'error': str(e)
+                })
 
         return results
 
-    def get_stats(self):
-        return self.vector_store.get_document_stats()
\ No newline at end of file
+    def get_stats(self, tenant: Optional[str] = None):
+        return self.vector_store.get_document_stats(tenant)
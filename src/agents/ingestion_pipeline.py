@@ -0,0 +1,211 @@
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+from loguru import logger
+
+from src.core.document_loader import DocumentLoader
+
+
+_STOP = object()
+
+
+def _parse_file(file_path: str):
+    # время начала по часам системы, чтобы стадия parse легла на общую шкалу с потоками родителя
+    started = time.time()
+    start = time.perf_counter()
+    doc = DocumentLoader.from_file(file_path)
+    return doc, started, time.perf_counter() - start
+
+
+class IngestionPipeline:
+    def __init__(self, agent, workers: int = 4, summary_workers: int = 2,
+                 queue_size: int = 8, embed_batch_size: int = 64):
+        self.agent = agent
+        self.workers = workers
+        self.summary_workers = summary_workers
+        self.queue_size = queue_size
+        self.embed_batch_size = embed_batch_size
+        self._lock = threading.Lock()
+
+    def run(self, files: List[Path], force_reprocess: bool = False,
+            tenant: Optional[str] = None) -> Dict[str, List]:
+        results = {
+            'processed': [],
+            'skipped': [],
+            'errors': []
+        }
+
+        parsed_q = queue.Queue(maxsize=self.queue_size)
+        embed_q = queue.Queue(maxsize=self.queue_size)
+        write_q = queue.Queue(maxsize=self.queue_size)
+
+        logger.info(f'Конвейер: {len(files)} файлов, {self.workers} процессов парсинга, '
+                    f'{self.summary_workers} потоков суммаризации')
+
+        threads = [threading.Thread(target=self._parse_stage,
+                                    args=(files, parsed_q, results, force_reprocess, tenant))]
+        threads += [
+            threading.Thread(target=self._summary_stage,
+                             args=(parsed_q, embed_q, results, force_reprocess, tenant))
+            for _ in range(self.summary_workers)
+        ]
+        threads.append(threading.Thread(target=self._embed_stage, args=(embed_q, write_q, results)))
+        threads.append(threading.Thread(target=self._write_stage, args=(write_q, results)))
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return results
+
+    def _record(self, results: Dict[str, List], result: Dict[str, Any]):
+        with self._lock:
+            if result.get('status') == 'success':
+                results['processed'].append(result)
+            elif result.get('status') == 'skipped':
+                results['skipped'].append(result)
+            else:
+                results['errors'].append(result)
+
+    def _record_error(self, results: Dict[str, List], file_path: str, e: Exception):
+        logger.error(f'Ошибка обработки {Path(file_path).name}: {e}')
+        self._record(results, {
+            'file': str(file_path),
+            'error': str(e)
+        })
+
+    def _parse_stage(self, files: List[Path], parsed_q: queue.Queue, results: Dict[str, List],
+                     force_reprocess: bool = False, tenant: Optional[str] = None):
+        in_flight = {}
+        context = multiprocessing.get_context('spawn')
+
+        def drain(futures):
+            for future in futures:
+                file_path, manifest_entry = in_flight.pop(future)
+                try:
+                    doc, started, seconds = future.result()
+                except Exception as e:
+                    self._record_error(results, file_path, e)
+                    continue
+
+                self.agent.timer.add('parse', seconds, started=started)
+
+                if not doc:
+                    self._record_error(results, file_path, RuntimeError('Не удалось загрузить файл'))
+                    continue
+
+                parsed_q.put((file_path, doc, manifest_entry))
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as pool:
+                for file_path in files:
+                    if len(in_flight) >= self.workers * 2:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        drain(done)
+
+                    manifest_entry = self.agent._check_manifest(file_path, force_reprocess, tenant)
+                    if manifest_entry['status'] == 'unchanged':
+                        self._record(results, self.agent._manifest_skip(file_path, manifest_entry))
+                        continue
+
+                    logger.info(f'Обработка файла: {file_path.name}')
+                    future = pool.submit(_parse_file, str(file_path))
+                    in_flight[future] = (str(file_path), manifest_entry)
+
+                while in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    drain(done)
+        finally:
+            for _ in range(self.summary_workers):
+                parsed_q.put(_STOP)
+
+    def _summary_stage(self, parsed_q: queue.Queue, embed_q: queue.Queue,
+                       results: Dict[str, List], force_reprocess: bool, tenant: Optional[str] = None):
+        try:
+            while True:
+                item = parsed_q.get()
+                if item is _STOP:
+                    break
+
+                file_path, doc, manifest_entry = item
+                raw_hash = manifest_entry.get('raw_hash')
+                try:
+                    job = self.agent._prepare_document(doc, force_reprocess, tenant,
+                                                       manifest_entry.get('doc_uuid'))
+                except Exception as e:
+                    self._record_error(results, file_path, e)
+                    continue
+
+                if job['status'] != 'pending':
+                    self.agent._remember(file_path, job, tenant, raw_hash)
+                    self._record(results, job)
+                    continue
+
+                job['file'] = file_path
+                job['raw_hash'] = raw_hash
+                embed_q.put(job)
+        finally:
+            embed_q.put(_STOP)
+
+    def _embed_stage(self, embed_q: queue.Queue, write_q: queue.Queue, results: Dict[str, List]):
+        stopped = 0
+
+        try:
+            while stopped < self.summary_workers:
+                item = embed_q.get()
+                if item is _STOP:
+                    stopped += 1
+                    continue
+
+                jobs = [item]
+                total = len(item['texts_to_embed'])
+
+                while total < self.embed_batch_size:
+                    try:
+                        item = embed_q.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopped += 1
+                        continue
+                    jobs.append(item)
+                    total += len(item['texts_to_embed'])
+
+                texts = [text for job in jobs for text in job['texts_to_embed']]
+                try:
+                    vectors = self.agent._embed_texts(texts) if texts else np.empty((0, 0))
+                except Exception as e:
+                    for job in jobs:
+                        self.agent._discard(job)
+                        self._record_error(results, job['file'], e)
+                    continue
+
+                offset = 0
+                for job in jobs:
+                    count = len(job['texts_to_embed'])
+                    write_q.put((job, vectors[offset:offset + count]))
+                    offset += count
+        finally:
+            write_q.put(_STOP)
+
+    def _write_stage(self, write_q: queue.Queue, results: Dict[str, List]):
+        while True:
+            item = write_q.get()
+            if item is _STOP:
+                break
+
+            job, vectors = item
+            try:
+                result = self.agent._store_chunks(job, vectors)
+                self.agent._remember(job['file'], result, job.get('tenant'), job.get('raw_hash'))
+                self._record(results, result)
+            except Exception as e:
+                self.agent._discard(job)
+                self._record_error(results, job['file'], e)
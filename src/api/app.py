@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from typing import Optional
+
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from loguru import logger
+from pydantic import BaseModel
+
+from src.agents.analytical_qa import AnalyticalQAAgent
+from src.agents.data_engineer import DataEngineerAgent
+from src.api.batcher import QueryBatcher
+from src.core.services.registry import registry
+from src.config import settings
+
+
+class AskRequest(BaseModel):
+    query: str
+    tenant: Optional[str] = None
+
+
+qa_agent = AnalyticalQAAgent()
+engineer = DataEngineerAgent()
+batcher = QueryBatcher(lambda queries: registry.get_embedding_engine().encode_queries(queries))
+ingest_semaphore = asyncio.Semaphore(settings.API_INGEST_CONCURRENCY)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.API_WARM_UP:
+        await run_in_threadpool(registry.warm_up, True, True, [qa_agent.model_name])
+    await batcher.start()
+    logger.info('Documind API запущен')
+
+    yield
+
+    await batcher.stop()
+    await run_in_threadpool(registry.release)
+
+
+app = FastAPI(title='Documind', lifespan=lifespan)
+
+
+async def _query_embedding(query: str):
+    cached = qa_agent.cached_query_embedding(query)
+    if cached is not None:
+        return cached
+    return await batcher.embed(query)
+
+
+@app.post('/ask')
+async def ask(request: AskRequest):
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail='Пустой вопрос')
+
+    # эмбеддинг считается здесь, поэтому время ожидания в очереди батчера добавляется к этапу embed
+    stage_start = time.perf_counter()
+    query_embedding = await _query_embedding(request.query)
+    embed_ms = (time.perf_counter() - stage_start) * 1000
+
+    result = await run_in_threadpool(qa_agent.answer, request.query, query_embedding, request.tenant)
+    timings = result.get('timings')
+    if timings:
+        timings['embed'] = round(timings.get('embed', 0) + embed_ms, 1)
+        timings['total'] = round(timings.get('total', 0) + embed_ms, 1)
+    return result
+
+
+@app.post('/ask/stream')
+async def ask_stream(request: AskRequest):
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail='Пустой вопрос')
+
+    stage_start = time.perf_counter()
+    query_embedding = await _query_embedding(request.query)
+    embed_ms = (time.perf_counter() - stage_start) * 1000
+
+    async def events():
+        async for event in qa_agent.astream_answer(request.query, query_embedding, request.tenant):
+            # first_token и total_ms отсчитываются от начала ответа агента, поэтому тоже включают ожидание батчера
+            if event['type'] == 'timing' and event['stage'] in ('embed', 'first_token'):
+                event = {**event, 'ms': round(event['ms'] + embed_ms, 1)}
+            elif event['type'] == 'done' and 'total_ms' in event:
+                event = {**event, 'total_ms': round(event['total_ms'] + embed_ms, 1)}
+            yield json.dumps(event, ensure_ascii=False) + '\n'
+
+    return StreamingResponse(events(), media_type='application/x-ndjson')
+
+
+def _save_upload(source, filename: str) -> Path:
+    settings.UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    partial = settings.UPLOAD_DIR / f'.{uuid.uuid4().hex}.part'
+    sha = hashlib.sha256()
+
+    try:
+        with open(partial, 'wb') as f:
+            while chunk := source.read(1024 * 1024):
+                sha.update(chunk)
+                f.write(chunk)
+
+        # одинаковые загрузки попадают в один файл и находятся в манифесте, разные не перезаписывают друг друга
+        target = settings.UPLOAD_DIR / f'{sha.hexdigest()[:16]}_{filename}'
+        os.replace(partial, target)
+        return target
+    finally:
+        partial.unlink(missing_ok=True)
+
+
+@app.post('/ingest')
+async def ingest(file: UploadFile = File(...), force_reprocess: bool = Form(False),
+                 tenant: Optional[str] = Form(None)):
+    filename = Path(file.filename or 'upload').name
+
+    async with ingest_semaphore:
+        target = await run_in_threadpool(_save_upload, file.file, filename)
+        return await run_in_threadpool(engineer.process_file, str(target), force_reprocess, False, tenant,
+                                       filename)
+
+
+@app.get('/stats')
+async def stats(tenant: Optional[str] = None):
+    embedding_cache = registry.get_embedding_cache()
+    summary_cache = registry.get_summary_cache()
+    file_manifest = registry.get_file_manifest()
+    parent_cache = qa_agent.vector_store.parent_cache
+
+    return {
+        'index': await run_in_threadpool(engineer.get_stats, tenant),
+        'query_batcher': batcher.stats(),
+        'query_cache': qa_agent.query_cache.stats(),
+        'answer_cache': qa_agent.answer_cache.stats(),
+        'parent_cache': parent_cache.stats() if parent_cache else None,
+        'embedding_cache': embedding_cache.stats() if embedding_cache else None,
+        'summary_cache': summary_cache.stats() if summary_cache else None,
+        'file_manifest': file_manifest.stats() if file_manifest else None,
+        'loaded': registry.loaded()
+    }
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(app, host='0.0.0.0', port=8000)
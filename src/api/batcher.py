@@ -0,0 +1,77 @@
+import asyncio
+from typing import Callable, List, Dict, Any, Optional
+
+import numpy as np
+from loguru import logger
+
+from src.config import settings
+
+
+class QueryBatcher:
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray],
+                 window_ms: float = None, max_batch: int = None):
+        self.encode_fn = encode_fn
+        self.window = (window_ms if window_ms is not None else settings.API_BATCH_WINDOW_MS) / 1000
+        self.max_batch = max_batch or settings.API_MAX_BATCH
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.batches = 0
+        self.queries = 0
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def embed(self, query: str) -> np.ndarray:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((query, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            queries = [query for query, _ in batch]
+            try:
+                vectors = await asyncio.to_thread(self.encode_fn, queries)
+            except Exception as e:
+                logger.error(f'Ошибка батчевого эмбеддинга запросов: {e}')
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.queries += len(batch)
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'batches': self.batches,
+            'queries': self.queries,
+            'avg_batch_size': round(self.queries / self.batches, 2) if self.batches else 0
+        }
@@ -14,7 +14,74 @@ class Config:
     WEAVIATE_URL = os.getenv('WEAVIATE_URL', 'http://localhost:8080')
     WEAVIATE_GRPC_URL = os.getenv('WEAVIATE_GRPC_URL', 'localhost:50051')
 
-    CHUNK_SIZE = 1000
-    CHUNK_OVERLAP = 200
+    VECTOR_BACKEND = os.getenv('VECTOR_BACKEND', 'weaviate')  # weaviate | local
+    LOCAL_STORE_DIR = DATA_DIR / 'vector_store'
+    LOCAL_HNSW = os.getenv('LOCAL_HNSW', '0') == '1'
+
+    VECTOR_INDEX_TYPE = os.getenv('VECTOR_INDEX_TYPE', 'hnsw')  # hnsw | flat | dynamic; dynamic требует ASYNC_INDEXING=true в Weaviate
+    HNSW_EF = int(os.getenv('HNSW_EF', -1))
+    HNSW_EF_CONSTRUCTION = int(os.getenv('HNSW_EF_CONSTRUCTION', 128))
+    HNSW_MAX_CONNECTIONS = int(os.getenv('HNSW_MAX_CONNECTIONS', 32))
+    VECTOR_COMPRESSION = os.getenv('VECTOR_COMPRESSION') or None  # pq | bq | sq
+    VECTOR_RESCORE_LIMIT = int(os.getenv('VECTOR_RESCORE_LIMIT', 200))
+    VECTOR_TRAINING_LIMIT = 100000
+    PQ_SEGMENTS = 0
+    DYNAMIC_INDEX_THRESHOLD = 10000
+
+    WEAVIATE_BATCH_MODE = os.getenv('WEAVIATE_BATCH_MODE', 'fixed')  # fixed | rate | dynamic
+    WEAVIATE_BATCH_SIZE = int(os.getenv('WEAVIATE_BATCH_SIZE', 200))
+    WEAVIATE_BATCH_CONCURRENCY = int(os.getenv('WEAVIATE_BATCH_CONCURRENCY', 2))
+    WEAVIATE_BATCH_RATE = int(os.getenv('WEAVIATE_BATCH_RATE', 600))  # запросов в минуту для режима rate
+    WEAVIATE_BATCH_RETRIES = 3
+    WEAVIATE_BATCH_BACKOFF = 0.5
+
+    MULTI_TENANCY = os.getenv('MULTI_TENANCY', '0') == '1'
+    DEFAULT_TENANT = os.getenv('DEFAULT_TENANT', 'default')
+    WEAVIATE_SHARDS = int(os.getenv('WEAVIATE_SHARDS', 1))  # только без multi-tenancy
+
+    OLLAMA_BASE_URL = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
+    LLM_MODEL = os.getenv('LLM_MODEL', 'gemma3:4b')
+    SUMMARY_CONCURRENCY = int(os.getenv('SUMMARY_CONCURRENCY', 4))
+    SUMMARY_CACHE_ENABLED = os.getenv('SUMMARY_CACHE_ENABLED', '1') == '1'
+    SUMMARY_CACHE_PATH = DATA_DIR / 'cache' / 'summaries.sqlite'
+
+    CHUNK_SIZE = 400  # токены токенизатора e5
+    CHUNK_OVERLAP = 50
+
+    PDF_ENGINE = os.getenv('PDF_ENGINE', 'native')  # native | unstructured
+    PDF_MIN_PAGE_CHARS = 20
+    PDF_OCR_DPI = 200
+
+    OCR_LANGUAGES = ['ru', 'en']
+    OCR_MAX_SIDE = 2560
+    OCR_BATCH_SIZE = 8
+
+    STREAM_WINDOW_SIZE = 256
+
+    FILE_MANIFEST_ENABLED = os.getenv('FILE_MANIFEST_ENABLED', '1') == '1'
+    FILE_MANIFEST_PATH = DATA_DIR / 'cache' / 'manifest.sqlite'
+
+    QUERY_CACHE_SIZE = 1024
+    QUERY_CACHE_TTL = 3600
+    ANSWER_CACHE_SIZE = 512
+    ANSWER_CACHE_TTL = 900
+    PARENT_CACHE_SIZE = 1024
+    PARENT_CACHE_TTL = 3600
+    INDEX_GENERATION_PATH = DATA_DIR / 'cache' / 'index_generation'
+
+    API_BATCH_WINDOW_MS = float(os.getenv('API_BATCH_WINDOW_MS', 5))
+    API_MAX_BATCH = 64
+    API_INGEST_CONCURRENCY = 1
+    API_WARM_UP = os.getenv('API_WARM_UP', '1') == '1'
+    UPLOAD_DIR = DATA_DIR / 'uploads'
+
+    EMBEDDING_MODEL = 'intfloat/multilingual-e5-large'
+    EMBEDDING_MAX_TOKENS = 512
+    EMBEDDING_DEVICE = os.getenv('EMBEDDING_DEVICE')
+    EMBEDDING_TOKEN_BUDGET = int(os.getenv('EMBEDDING_TOKEN_BUDGET', 16384))
+    EMBEDDING_MAX_BATCH = 128
+    EMBEDDING_CACHE_ENABLED = os.getenv('EMBEDDING_CACHE_ENABLED', '1') == '1'
+    EMBEDDING_CACHE_DIR = DATA_DIR / 'cache' / 'embeddings'
+    EMBEDDING_CACHE_MAX_MB = int(os.getenv('EMBEDDING_CACHE_MAX_MB', 2048))
 
 settings = Config()
\ No newline at end of file
@@ -0,0 +1,87 @@
+from typing import Iterable, Iterator, List, Tuple
+
+from src.config import settings
+from src.core.document_loader import DocumentChunk
+
+
+class ChunkAssembler:
+    def __init__(self, tokenizer, chunk_size: int = None, chunk_overlap: int = None,
+                 max_tokens: int = None, prefix: str = 'passage: '):
+        self.tokenizer = tokenizer
+        max_tokens = max_tokens or settings.EMBEDDING_MAX_TOKENS
+
+        reserved = len(tokenizer(prefix, add_special_tokens=True)['input_ids'])
+        self.budget = min(chunk_size or settings.CHUNK_SIZE, max_tokens - reserved)
+        self.overlap = min(chunk_overlap if chunk_overlap is not None else settings.CHUNK_OVERLAP,
+                           self.budget // 2)
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        if not texts:
+            return []
+        encoded = self.tokenizer(texts, add_special_tokens=False)['input_ids']
+        return [len(ids) for ids in encoded]
+
+    def assemble(self, chunks: Iterable[DocumentChunk]) -> Iterator[DocumentChunk]:
+        buffer: List[DocumentChunk] = []
+        buffer_tokens = 0
+
+        for chunk, n_tokens in self._with_token_counts(chunks):
+            if buffer and (chunk.page_number != buffer[0].page_number
+                           or chunk.element_type == 'Title'
+                           or buffer_tokens + n_tokens + 1 > self.budget):
+                yield self._merge(buffer)
+                buffer, buffer_tokens = [], 0
+
+            if n_tokens > self.budget:
+                yield from self._split(chunk)
+                continue
+
+            buffer.append(chunk)
+            buffer_tokens += n_tokens + 1
+
+        if buffer:
+            yield self._merge(buffer)
+
+    def _with_token_counts(self, chunks: Iterable[DocumentChunk],
+                           batch_size: int = 64) -> Iterator[Tuple[DocumentChunk, int]]:
+        batch = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                yield from zip(batch, self.count_tokens([c.text for c in batch]))
+                batch = []
+
+        if batch:
+            yield from zip(batch, self.count_tokens([c.text for c in batch]))
+
+    @staticmethod
+    def _merge(buffer: List[DocumentChunk]) -> DocumentChunk:
+        if len(buffer) == 1:
+            return buffer[0]
+
+        element_types = list(dict.fromkeys(chunk.element_type for chunk in buffer))
+        metadata = {
+            'page_number': buffer[0].page_number,
+            'element_type': element_types[0] if len(element_types) == 1 else 'CompositeElement',
+            'element_types': element_types,
+            'source': buffer[0].metadata.get('source')
+        }
+        return DocumentChunk('\n'.join(chunk.text for chunk in buffer), metadata)
+
+    def _split(self, chunk: DocumentChunk) -> Iterator[DocumentChunk]:
+        offsets = self.tokenizer(chunk.text, add_special_tokens=False,
+                                 return_offsets_mapping=True)['offset_mapping']
+        step = self.budget - self.overlap
+
+        for part, start in enumerate(range(0, len(offsets), step)):
+            window = offsets[start:start + self.budget]
+            metadata = {
+                'page_number': chunk.page_number,
+                'element_type': chunk.element_type,
+                'source': chunk.metadata.get('source'),
+                'split_part': part
+            }
+            yield DocumentChunk(chunk.text[window[0][0]:window[-1][1]], metadata)
+
+            if start + self.budget >= len(offsets):
+                break
@@ -1,16 +1,14 @@
 import os
+import re
+from array import array
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterator, Iterable, Union
 from enum import Enum
-import magic
+from statistics import median
 from loguru import logger
 
-from unstructured.partition.auto import partition
-from unstructured.cleaners.core import clean_extra_whitespace
-import pymupdf
-import easyocr
-import torch
-from PIL import Image
+from src.config import settings
+from src.core.services.registry import registry
 
 
 class DocumentType(Enum):
@@ -21,34 +19,138 @@ class DocumentType(Enum):
     UNKNOWN = 'unknown'
 
 
+# html, csv, xml и прочие text/* размечены, их разбирает unstructured
+PLAIN_TEXT_MIME_TYPES = ('text/plain', 'text/markdown', 'text/x-markdown')
+
+
+def clean_extra_whitespace(text: str) -> str:
+    cleaned_text = re.sub(r'[\xa0\n]', ' ', text)
+    cleaned_text = re.sub(r'([ ]{2,})', ' ', cleaned_text)
+    return cleaned_text.strip()
+
+
 class DocumentChunk:
+    __slots__ = ('text', 'metadata', 'page_number', 'element_type')
+
     def __init__(self, text: str, metadata: Dict[str, Any]):
         self.text = clean_extra_whitespace(text)
         self.metadata = metadata
         self.page_number = metadata.get('page_number', 1)
         self.element_type = metadata.get('element_type', 'UncategorizedText')
 
+    @classmethod
+    def view(cls, text: str, page_number: int, element_type: str, source: Optional[str]) -> 'DocumentChunk':
+        chunk = cls.__new__(cls)
+        chunk.text = text
+        chunk.page_number = page_number
+        chunk.element_type = element_type
+        chunk.metadata = {'page_number': page_number, 'element_type': element_type, 'source': source}
+        return chunk
+
     def __repr__(self):
         return f'Chunk(type={self.element_type}, page={self.page_number}, chars={len(self.text)}'
 
 
+class ChunkStore:
+    def __init__(self, chunks: Iterable[DocumentChunk] = ()):
+        self._offsets = array('q', [0])
+        self._pages = array('i')
+        self._types = array('H')
+        self._sources = array('H')
+        self._names: List[Optional[str]] = []
+        self._codes: Dict[Optional[str], int] = {}
+        self._page_index: Dict[int, array] = {}
+
+        texts = []
+        for chunk in chunks:
+            texts.append(chunk.text)
+            self._offsets.append(self._offsets[-1] + len(chunk.text))
+            self._pages.append(chunk.page_number)
+            self._types.append(self._code(chunk.element_type))
+            self._sources.append(self._code(chunk.metadata.get('source')))
+            self._page_index.setdefault(chunk.page_number, array('I')).append(len(self._pages) - 1)
+        self._text = ''.join(texts)
+
+    def _code(self, name: Optional[str]) -> int:
+        code = self._codes.get(name)
+        if code is None:
+            code = self._codes[name] = len(self._names)
+            self._names.append(name)
+        return code
+
+    def text(self, i: int) -> str:
+        return self._text[self._offsets[i]:self._offsets[i + 1]]
+
+    def _chunk(self, i: int) -> DocumentChunk:
+        return DocumentChunk.view(self.text(i), self._pages[i], self._names[self._types[i]],
+                                  self._names[self._sources[i]])
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    def __iter__(self) -> Iterator[DocumentChunk]:
+        return (self._chunk(i) for i in range(len(self)))
+
+    def __getitem__(self, item: Union[int, slice]):
+        if isinstance(item, slice):
+            return [self._chunk(i) for i in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError('ChunkStore index out of range')
+        return self._chunk(item)
+
+    def texts(self) -> Iterator[str]:
+        return (self.text(i) for i in range(len(self)))
+
+    def by_page(self, page_number: int) -> List[DocumentChunk]:
+        return [self._chunk(i) for i in self._page_index.get(page_number, ())]
+
+    def max_page(self) -> int:
+        return max(self._page_index, default=0)
+
+    def total_characters(self) -> int:
+        return self._offsets[-1]
+
+    def count_by_type(self) -> Dict[str, int]:
+        counts = {}
+        for code in self._types:
+            name = self._names[code]
+            counts[name] = counts.get(name, 0) + 1
+        return counts
+
+
 class Document:
-    def __init__(self, file_path: Path):
+    def __init__(self, file_path: Path, pdf_engine: Optional[str] = None, filename: Optional[str] = None):
         self.file_path = Path(file_path)
-        self.filename = self.file_path.name
+        self.filename = filename or self.file_path.name
+        self.mime_type = self._detect_mime_type()
         self.file_type = self._detect_file_type()
-        self.chunks: List[DocumentChunk] = []
+        self.pdf_engine = pdf_engine or settings.PDF_ENGINE
+        self._chunks = ChunkStore()
         self.metadata = {
             'filename': self.filename,
             'file_type': self.file_type.value,
             'file_size': self.file_path.stat().st_size,
             'pages': 0
         }
-        self._reader = None
 
-    def _detect_file_type(self) -> DocumentType:
+    @property
+    def chunks(self) -> ChunkStore:
+        return self._chunks
+
+    @chunks.setter
+    def chunks(self, chunks: Iterable[DocumentChunk]):
+        self._chunks = chunks if isinstance(chunks, ChunkStore) else ChunkStore(chunks)
+
+    def _detect_mime_type(self) -> str:
+        import magic
+
         mime = magic.Magic(mime=True)
-        mime_type = mime.from_file(str(self.file_path))
+        return mime.from_file(str(self.file_path))
+
+    def _detect_file_type(self) -> DocumentType:
+        mime_type = self.mime_type
 
         if 'pdf' in mime_type:
             return DocumentType.PDF
@@ -65,12 +167,9 @@ class Document:
         logger.info(f'Загрузка документа: {self.filename} ({self.file_type.value})')
 
         try:
-            if self.file_type == DocumentType.IMAGE:
-                self._load_with_ocr()
-            else:
-                self._load_with_unstructured()
+            self.chunks = ChunkStore(self._iter_source())
 
-            self.metadata['pages'] = max([chunk.page_number for chunk in self.chunks], default=0)
+            self.metadata['pages'] = self.chunks.max_page()
             logger.success(f'Документ загружен: {len(self.chunks)} чанков, '
                            f'{self.metadata["pages"]} страниц')
             return True
@@ -79,7 +178,46 @@ class Document:
             logger.error(f'Ошибка загрузки {self.filename}: {e}')
             return False
 
-    def _load_with_unstructured(self):
+    def iter_chunks(self) -> Iterator[DocumentChunk]:
+        if self.chunks:
+            yield from self.chunks
+            return
+
+        logger.info(f'Потоковая загрузка документа: {self.filename} ({self.file_type.value})')
+        for chunk in self._iter_source():
+            if chunk.page_number > self.metadata['pages']:
+                self.metadata['pages'] = chunk.page_number
+            yield chunk
+
+    def _iter_source(self) -> Iterator[DocumentChunk]:
+        if self.file_type == DocumentType.IMAGE:
+            return self._iter_ocr()
+        elif self.file_type == DocumentType.PDF and self.pdf_engine == 'native':
+            return self._iter_pdf_native()
+        elif self.file_type == DocumentType.TXT and self.mime_type in PLAIN_TEXT_MIME_TYPES:
+            return self._iter_text()
+        else:
+            return self._iter_unstructured()
+
+    def _iter_text(self) -> Iterator[DocumentChunk]:
+        raw = self.file_path.read_bytes()
+        try:
+            text = raw.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            text = raw.decode('cp1251', errors='replace')
+
+        for paragraph in re.split(r'\n\s*\n', text):
+            if paragraph.strip():
+                metadata = {
+                    'page_number': 1,
+                    'element_type': 'NarrativeText',
+                    'source': 'text'
+                }
+                yield DocumentChunk(paragraph, metadata)
+
+    def _iter_unstructured(self) -> Iterator[DocumentChunk]:
+        from unstructured.partition.auto import partition
+
         elements = partition(
             filename=str(self.file_path),
             include_page_breaks=True,
@@ -100,20 +238,114 @@ class Document:
                     'source': 'unstructured'
                 }
 
-                chunk = DocumentChunk(element.text, metadata)
-                self.chunks.append(chunk)
+                yield DocumentChunk(element.text, metadata)
 
-    def _load_with_ocr(self):
-        logger.info('Используем OCR для изображения...')
+    def _iter_pdf_native(self) -> Iterator[DocumentChunk]:
+        import pymupdf
+
+        try:
+            pdf = pymupdf.open(self.file_path)
+        except Exception as e:
+            logger.warning(f'PyMuPDF не смог открыть {self.filename}: {e}. Используем unstructured')
+            yield from self._iter_unstructured()
+            return
+
+        ocr_pages = 0
+        pending = []
+        images = []
+        with pdf:
+            for page in pdf:
+                page_number = page.number + 1
+                page_chunks = self._extract_pdf_page(page, page_number)
+
+                if sum(len(chunk.text) for chunk in page_chunks) >= settings.PDF_MIN_PAGE_CHARS:
+                    if not pending:
+                        yield from page_chunks
+                        continue
+                    pending.append((page_number, page_chunks))
+                else:
+                    ocr_pages += 1
+                    pending.append((page_number, None))
+                    images.append(self._render_pdf_page(page))
+
+                if len(pending) >= settings.OCR_BATCH_SIZE:
+                    yield from self._flush_pdf_ocr(pending, images)
+                    pending, images = [], []
+
+            if pending:
+                yield from self._flush_pdf_ocr(pending, images)
+
+        if ocr_pages:
+            logger.info(f'Страниц без текстового слоя (OCR): {ocr_pages}')
+
+    @staticmethod
+    def _extract_pdf_page(page, page_number: int) -> List[DocumentChunk]:
+        page_dict = page.get_text('dict', sort=True)
+        blocks = [block for block in page_dict['blocks'] if block.get('type') == 0]
+
+        sizes = [span['size'] for block in blocks for line in block['lines']
+                 for span in line['spans'] if span['text'].strip()]
+        body_size = median(sizes) if sizes else 0
+
+        chunks = []
+        for block in blocks:
+            lines = [''.join(span['text'] for span in line['spans']) for line in block['lines']]
+            text = '\n'.join(lines).strip()
+            if not text:
+                continue
+
+            block_size = max((span['size'] for line in block['lines'] for span in line['spans']),
+                             default=0)
+
+            if len(lines) <= 2 and len(text) < 200 and block_size > body_size * 1.15:
+                element_type = 'Title'
+            elif text[0] in '•●▪–-*':
+                element_type = 'ListItem'
+            else:
+                element_type = 'NarrativeText'
+
+            metadata = {
+                'page_number': page_number,
+                'element_type': element_type,
+                'coordinates': tuple(block['bbox']),
+                'source': 'pymupdf'
+            }
+            chunks.append(DocumentChunk(text, metadata))
+
+        return chunks
 
-        if self._reader is None:
-            self._reader = easyocr.Reader(['ru', 'en'], gpu=torch.cuda.is_available())
+    @staticmethod
+    def _render_pdf_page(page):
+        import numpy as np
+
+        pixmap = page.get_pixmap(dpi=settings.PDF_OCR_DPI)
+        return np.frombuffer(pixmap.samples, dtype=np.uint8) \
+            .reshape(pixmap.height, pixmap.width, pixmap.n).copy()
+
+    def _flush_pdf_ocr(self, pending, images) -> Iterator[DocumentChunk]:
+        ocr_results = iter(registry.get_ocr().readtext_batch(images))
+        scale = 72 / settings.PDF_OCR_DPI
+
+        for page_number, page_chunks in pending:
+            if page_chunks is not None:
+                yield from page_chunks
+                continue
+
+            for bbox, text in next(ocr_results):
+                metadata = {
+                    'page_number': page_number,
+                    'element_type': 'OCR_Text',
+                    'coordinates': tuple((x * scale, y * scale) for x, y in bbox),
+                    'source': 'easyocr'
+                }
+                yield DocumentChunk(text, metadata)
 
-        image = Image.open(self.file_path)
+    def _iter_ocr(self) -> Iterator[DocumentChunk]:
+        logger.info('Используем OCR для изображения...')
 
-        results = self._reader.readtext(str(self.file_path), paragraph=True)
+        results = registry.get_ocr().readtext_batch([self.file_path])[0]
 
-        for i, (bbox, text) in enumerate(results):
+        for bbox, text in results:
             metadata = {
                 'page_number': 1,
                 'element_type': 'OCR_Text',
@@ -121,41 +353,43 @@ class Document:
                 'source': 'easyocr'
             }
 
-            chunk = DocumentChunk(text, metadata)
-            self.chunks.append(chunk)
+            yield DocumentChunk(text, metadata)
 
-        if not self.chunks:
+        if not results:
             logger.warning(f'Не удалось распознать текст на изображении {self.filename}')
 
     def get_full_text(self) -> str:
-        return '\n\n'.join([chunk.text for chunk in self.chunks])
+        return '\n\n'.join(self.chunks.texts())
 
     def get_chunks_by_page(self, page_num: int) -> List[DocumentChunk]:
-        return [chunk for chunk in self.chunks if chunk.page_number == page_num]
+        return self.chunks.by_page(page_num)
 
     def get_statistic(self) -> Dict[str, Any]:
         return {
             'total_chunks': len(self.chunks),
             'total_pages': self.metadata['pages'],
-            'total_characters': sum([len(chunk.text) for chunk in self.chunks]),
+            'total_characters': self.chunks.total_characters(),
             'chunks_by_type': self._count_chunks_by_type()
         }
 
     def _count_chunks_by_type(self):
-        counts = {}
-        for chunk in self.chunks:
-            counts[chunk.element_type] = counts.get(chunk.element_type, 0) + 1
-        return counts
+        return self.chunks.count_by_type()
 
 
 class DocumentLoader:
     @staticmethod
-    def from_file(file_path: Path) -> Optional[Document]:
-        doc = Document(file_path)
+    def from_file(file_path: Path, pdf_engine: Optional[str] = None,
+                  filename: Optional[str] = None) -> Optional[Document]:
+        doc = Document(file_path, pdf_engine=pdf_engine, filename=filename)
         if doc.load():
             return doc
         return None
 
+    @staticmethod
+    def from_file_streaming(file_path: Path, pdf_engine: Optional[str] = None,
+                            filename: Optional[str] = None) -> Document:
+        return Document(file_path, pdf_engine=pdf_engine, filename=filename)
+
     @staticmethod
     def from_directory(directory_path: Path, extensions: List[str] = None) -> List[Document]:
         if extensions == None:
@@ -0,0 +1,505 @@
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Dict, Any, Iterable, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from loguru import logger
+
+from src.core.services.query_cache import index_generation
+from src.core.vector_store_base import BaseVectorStore
+from src.config import settings
+
+
+DOCUMENT_FIELDS = ('filename', 'doc_type', 'summary', 'content_hash', 'file_size',
+                   'total_pages', 'total_chunks', 'added_at', 'updated_at')
+CHUNK_FIELDS = ('content', 'page_number', 'chunk_index', 'element_type', 'chunk_hash')
+
+
+class _TenantIndex:
+    def __init__(self, path: Path, dim: int, alive_rows: Iterable[int], use_hnsw: bool):
+        self.path = path
+        self.dim = dim
+        self.vectors: Optional[np.memmap] = None
+        self._open(0)
+
+        self.alive = np.zeros(self.vectors.shape[0], dtype=bool)
+        self.alive[list(alive_rows)] = True
+        self.hnsw = self._build_hnsw() if use_hnsw else None
+
+    def _open(self, min_rows: int):
+        row_bytes = self.dim * 4
+        size = self.path.stat().st_size if self.path.exists() else 0
+        rows = max(size // row_bytes, min_rows, 1)
+
+        if size < rows * row_bytes:
+            with open(self.path, 'ab') as f:
+                f.truncate(rows * row_bytes)
+
+        self.vectors = np.memmap(self.path, dtype=np.float32, mode='r+', shape=(rows, self.dim))
+
+    def ensure_capacity(self, rows: int):
+        capacity = self.vectors.shape[0]
+        if rows <= capacity:
+            return
+
+        capacity = max(rows, capacity * 2, 1024)
+        self.vectors.flush()
+        self.vectors = None
+        self._open(capacity)
+        self.alive = np.concatenate([self.alive, np.zeros(capacity - len(self.alive), dtype=bool)])
+        if self.hnsw is not None:
+            self.hnsw.resize_index(capacity)
+
+    def _build_hnsw(self):
+        import hnswlib
+
+        index = hnswlib.Index(space='cosine', dim=self.dim)
+        index.init_index(max_elements=self.vectors.shape[0], ef_construction=settings.HNSW_EF_CONSTRUCTION,
+                         M=max(settings.HNSW_MAX_CONNECTIONS // 2, 4))
+        rows = np.flatnonzero(self.alive)
+        if len(rows):
+            index.add_items(self.vectors[rows], rows)
+        return index
+
+    def write(self, rows: List[int], vectors: np.ndarray):
+        self.ensure_capacity(max(rows) + 1)
+        self.vectors[rows] = vectors
+        self.vectors.flush()
+        self.alive[rows] = True
+        if self.hnsw is not None:
+            self.hnsw.add_items(vectors, rows)
+
+    def remove(self, rows: List[int]):
+        self.alive[rows] = False
+        if self.hnsw is not None:
+            for row in rows:
+                self.hnsw.mark_deleted(row)
+
+    def search(self, vector: np.ndarray, limit: int, high_water: int) -> Tuple[np.ndarray, np.ndarray]:
+        k = min(limit, int(self.alive.sum()))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        if self.hnsw is not None:
+            self.hnsw.set_ef(settings.HNSW_EF if settings.HNSW_EF > 0 else max(k * 4, 64))
+            labels, distances = self.hnsw.knn_query(vector, k=k)
+            return labels[0].astype(np.int64), distances[0]
+
+        scores = np.asarray(self.vectors[:high_water]) @ vector
+        scores[~self.alive[:high_water]] = -np.inf
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top, 1 - scores[top]
+
+    def close(self):
+        if self.vectors is not None:
+            self.vectors.flush()
+            self.vectors = None
+
+
+class LocalVectorStore(BaseVectorStore):
+    def __init__(self, store_dir: Path = None, use_hnsw: bool = None):
+        self.store_dir = Path(store_dir or settings.LOCAL_STORE_DIR)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.use_hnsw = settings.LOCAL_HNSW if use_hnsw is None else use_hnsw
+        if self.use_hnsw:
+            try:
+                import hnswlib  # noqa: F401
+            except ImportError:
+                logger.warning('hnswlib не установлен, используется точный поиск')
+                self.use_hnsw = False
+
+        self._lock = threading.RLock()
+        self._indexes: Dict[str, _TenantIndex] = {}
+
+        self._db = sqlite3.connect(self.store_dir / 'store.sqlite', check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS documents (
+                uuid TEXT PRIMARY KEY,
+                tenant TEXT NOT NULL,
+                filename TEXT,
+                doc_type TEXT,
+                summary TEXT,
+                content_hash TEXT,
+                file_size INTEGER,
+                total_pages INTEGER,
+                total_chunks INTEGER,
+                added_at TEXT,
+                updated_at TEXT
+            );
+            CREATE INDEX IF NOT EXISTS documents_hash ON documents (tenant, content_hash);
+            DROP INDEX IF EXISTS documents_filename;
+            CREATE TABLE IF NOT EXISTS chunks (
+                uuid TEXT NOT NULL,
+                tenant TEXT NOT NULL,
+                document_id TEXT NOT NULL,
+                row INTEGER NOT NULL,
+                content TEXT,
+                page_number INTEGER,
+                chunk_index INTEGER,
+                element_type TEXT,
+                chunk_hash TEXT,
+                PRIMARY KEY (tenant, uuid)
+            );
+            CREATE INDEX IF NOT EXISTS chunks_document ON chunks (tenant, document_id);
+            CREATE UNIQUE INDEX IF NOT EXISTS chunks_row ON chunks (tenant, row);
+            CREATE TABLE IF NOT EXISTS tenants (
+                name TEXT PRIMARY KEY,
+                dim INTEGER,
+                next_row INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'ACTIVE'
+            );
+            CREATE TABLE IF NOT EXISTS free_rows (
+                tenant TEXT NOT NULL,
+                row INTEGER NOT NULL
+            );
+        ''')
+        self._db.commit()
+        logger.info(f'Локальное векторное хранилище открыто: {self.store_dir}')
+
+    @staticmethod
+    def _tenant(tenant: Optional[str]) -> str:
+        return tenant or settings.DEFAULT_TENANT
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(ZoneInfo(key='Europe/Moscow')).isoformat()
+
+    def _vectors_path(self, tenant: str) -> Path:
+        safe_name = ''.join(c if c.isalnum() else '_' for c in tenant)
+        return self.store_dir / f'{safe_name}.f32'
+
+    def _index(self, tenant: str, dim: int = None) -> Optional[_TenantIndex]:
+        index = self._indexes.get(tenant)
+        if index is not None:
+            return index
+
+        row = self._db.execute('SELECT dim FROM tenants WHERE name = ?', (tenant,)).fetchone()
+        if row is None or row['dim'] is None:
+            if dim is None:
+                return None
+            self._db.execute('INSERT OR IGNORE INTO tenants (name) VALUES (?)', (tenant,))
+            self._db.execute('UPDATE tenants SET dim = ?, status = ? WHERE name = ?', (dim, 'ACTIVE', tenant))
+        else:
+            dim = row['dim']
+            self._db.execute('UPDATE tenants SET status = ? WHERE name = ?', ('ACTIVE', tenant))
+
+        alive_rows = [r['row'] for r in self._db.execute('SELECT row FROM chunks WHERE tenant = ?', (tenant,))]
+        index = self._indexes[tenant] = _TenantIndex(self._vectors_path(tenant), dim, alive_rows, self.use_hnsw)
+        return index
+
+    def _allocate_rows(self, tenant: str, count: int) -> List[int]:
+        free = [r['row'] for r in self._db.execute(
+            'SELECT row FROM free_rows WHERE tenant = ? LIMIT ?', (tenant, count)
+        ).fetchall()]
+        if free:
+            self._db.execute(
+                f'DELETE FROM free_rows WHERE tenant = ? AND row IN ({",".join("?" * len(free))})',
+                (tenant, *free)
+            )
+
+        needed = count - len(free)
+        if needed <= 0:
+            return free
+
+        next_row = self._db.execute('SELECT next_row FROM tenants WHERE name = ?', (tenant,)).fetchone()[0]
+        self._db.execute('UPDATE tenants SET next_row = ? WHERE name = ?', (next_row + needed, tenant))
+        return free + list(range(next_row, next_row + needed))
+
+    def _high_water(self, tenant: str) -> int:
+        row = self._db.execute('SELECT next_row FROM tenants WHERE name = ?', (tenant,)).fetchone()
+        return row[0] if row else 0
+
+    def _chunk_rows(self, tenant: str, chunk_uuids: List[str]) -> Dict[str, int]:
+        rows = {}
+        for start in range(0, len(chunk_uuids), 500):
+            batch = chunk_uuids[start:start + 500]
+            rows.update((r['uuid'], r['row']) for r in self._db.execute(
+                f'SELECT uuid, row FROM chunks WHERE tenant = ? AND uuid IN ({",".join("?" * len(batch))})',
+                (tenant, *batch)
+            ))
+        return rows
+
+    def document_exists(self, content_hash: str, tenant: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                'SELECT uuid, filename, added_at, summary FROM documents WHERE tenant = ? AND content_hash = ? LIMIT 1',
+                (self._tenant(tenant), content_hash)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def create_document_object(
+            self, filename: str, summary: str, content_hash: str, doc_type: str = 'unknown',
+            file_size: int = 0, total_pages: int = 0, total_chunks: int = 0, tenant: Optional[str] = None
+    ) -> str:
+        existing = self.document_exists(content_hash, tenant)
+        if existing:
+            logger.warning(f'Документ уже существует в базе: {existing["filename"]} '
+                           f'(добавлен {existing["added_at"]}). Пропускаем загрузку.')
+            return existing['uuid']
+
+        doc_uuid = str(uuid.uuid4())
+        now = self._now()
+        with self._lock:
+            self._db.execute(
+                f'INSERT INTO documents (uuid, tenant, {", ".join(DOCUMENT_FIELDS)}) '
+                f'VALUES ({", ".join("?" * (len(DOCUMENT_FIELDS) + 2))})',
+                (doc_uuid, self._tenant(tenant), filename, doc_type, summary, content_hash, file_size,
+                 total_pages, total_chunks, now, now)
+            )
+            self._db.commit()
+
+        index_generation.bump()
+        logger.success(f'Документ {filename} успешно добавлен | UUID: {doc_uuid}')
+        return doc_uuid
+
+    def get_document(self, doc_uuid: str, tenant: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                f'SELECT uuid, {", ".join(DOCUMENT_FIELDS)} FROM documents WHERE tenant = ? AND uuid = ?',
+                (self._tenant(tenant), str(doc_uuid))
+            ).fetchone()
+        return dict(row) if row else None
+
+    def update_document_object(self, doc_uuid: str, tenant: Optional[str] = None, **properties) -> bool:
+        properties['updated_at'] = self._now()
+        unknown = set(properties) - set(DOCUMENT_FIELDS)
+        if unknown:
+            raise ValueError(f'Неизвестные свойства документа: {", ".join(sorted(unknown))}')
+
+        with self._lock:
+            cursor = self._db.execute(
+                f'UPDATE documents SET {", ".join(f"{name} = ?" for name in properties)} '
+                f'WHERE tenant = ? AND uuid = ?',
+                (*properties.values(), self._tenant(tenant), str(doc_uuid))
+            )
+            self._db.commit()
+
+        if cursor.rowcount == 0:
+            raise ValueError(f'Документ {doc_uuid} не найден')
+
+        index_generation.bump()
+        logger.success(f'Документ {doc_uuid} обновлен')
+        return True
+
+    def get_document_chunks(self, doc_uuid: str, tenant: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT uuid, chunk_hash, chunk_index, page_number, element_type FROM chunks '
+                'WHERE tenant = ? AND document_id = ?',
+                (self._tenant(tenant), str(doc_uuid))
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def delete_chunks(self, chunk_uuids: List[str], tenant: Optional[str] = None):
+        tenant = self._tenant(tenant)
+        with self._lock:
+            self._delete_chunk_rows(tenant, self._chunk_rows(tenant, chunk_uuids))
+            self._db.commit()
+
+        index_generation.bump()
+        logger.info(f'Удалено {len(chunk_uuids)} устаревших чанков')
+
+    def _delete_chunk_rows(self, tenant: str, rows: Dict[str, int]):
+        if not rows:
+            return
+
+        self._db.executemany('DELETE FROM chunks WHERE tenant = ? AND uuid = ?',
+                             [(tenant, chunk_uuid) for chunk_uuid in rows])
+        self._db.executemany('INSERT INTO free_rows (tenant, row) VALUES (?, ?)',
+                             [(tenant, row) for row in rows.values()])
+
+        index = self._index(tenant)
+        if index is not None:
+            index.remove(list(rows.values()))
+
+    def update_chunk_positions(self, positions: Dict[str, Dict[str, Any]], tenant: Optional[str] = None):
+        tenant = self._tenant(tenant)
+        with self._lock:
+            for chunk_uuid, properties in positions.items():
+                unknown = set(properties) - set(CHUNK_FIELDS)
+                if unknown:
+                    raise ValueError(f'Неизвестные свойства чанка: {", ".join(sorted(unknown))}')
+                self._db.execute(
+                    f'UPDATE chunks SET {", ".join(f"{name} = ?" for name in properties)} '
+                    f'WHERE tenant = ? AND uuid = ?',
+                    (*properties.values(), tenant, chunk_uuid)
+                )
+            self._db.commit()
+
+        index_generation.bump()
+
+    def upsert_chunks_linked(self, chunks_data: List[Dict[str, Any]], vectors: np.ndarray,
+                             doc_uuid: str, tenant: Optional[str] = None,
+                             chunk_uuids: List[str] = None) -> Dict[str, Any]:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(chunks_data) != len(vectors):
+            raise ValueError(f"Несоответствие размеров: {len(chunks_data)} чанков и "
+                             f"{len(vectors)} векторов")
+        if not chunks_data:
+            return {'objects': 0, 'failed': 0, 'retries': 0, 'seconds': 0, 'objects_per_sec': 0, 'bytes_sent': 0}
+
+        if chunk_uuids is None:
+            occurrences = {}
+            chunk_uuids = []
+            for data in chunks_data:
+                chunk_hash = data.get('chunk_hash') or self.calculate_content_hash(data['content'])
+                chunk_uuids.append(self.chunk_uuid(doc_uuid, chunk_hash, occurrences.get(chunk_hash, 0)))
+                occurrences[chunk_hash] = occurrences.get(chunk_hash, 0) + 1
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms > 0, norms, 1)
+        tenant = self._tenant(tenant)
+        start = time.perf_counter()
+
+        with self._lock:
+            index = self._index(tenant, dim=vectors.shape[1])
+            if index.dim != vectors.shape[1]:
+                raise ValueError(f'Размерность векторов {vectors.shape[1]} не совпадает с индексом ({index.dim})')
+
+            existing = self._chunk_rows(tenant, chunk_uuids)
+            new_rows = iter(self._allocate_rows(tenant, len(set(chunk_uuids) - set(existing))))
+            rows = []
+            for chunk_uuid in chunk_uuids:
+                if chunk_uuid not in existing:
+                    existing[chunk_uuid] = next(new_rows)
+                rows.append(existing[chunk_uuid])
+
+            self._db.executemany(
+                f'INSERT OR REPLACE INTO chunks (uuid, tenant, document_id, row, {", ".join(CHUNK_FIELDS)}) '
+                f'VALUES ({", ".join("?" * (len(CHUNK_FIELDS) + 4))})',
+                [(chunk_uuid, tenant, str(doc_uuid), row, *(data.get(name) for name in CHUNK_FIELDS))
+                 for chunk_uuid, row, data in zip(chunk_uuids, rows, chunks_data)]
+            )
+            index.write(rows, vectors)
+            self._db.commit()
+
+        index_generation.bump()
+        elapsed = time.perf_counter() - start
+        stats = {
+            'objects': len(chunks_data),
+            'failed': 0,
+            'retries': 0,
+            'seconds': round(elapsed, 3),
+            'objects_per_sec': round(len(chunks_data) / elapsed, 1) if elapsed else 0,
+            'bytes_sent': int(vectors.nbytes)
+        }
+        logger.success(f'Успешно загружено {len(chunks_data)} чанков для документа {doc_uuid} '
+                       f'({stats["objects_per_sec"]} объектов/с)')
+        return stats
+
+    def search(self, vector: list[float], limit: int = 5, include_summary: bool = True,
+               tenant: Optional[str] = None) -> List[Dict[str, Any]]:
+        tenant = self._tenant(tenant)
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+
+        try:
+            with self._lock:
+                index = self._index(tenant)
+                if index is None:
+                    return []
+
+                rows, distances = index.search(query, limit, self._high_water(tenant))
+                if not len(rows):
+                    return []
+
+                found = {r['row']: r for r in self._db.execute(
+                    f'SELECT c.uuid, c.row, c.document_id, c.content, c.page_number, c.chunk_index, '
+                    f'c.element_type, d.filename, d.doc_type, d.summary '
+                    f'FROM chunks c LEFT JOIN documents d ON d.uuid = c.document_id '
+                    f'WHERE c.tenant = ? AND c.row IN ({",".join("?" * len(rows))})',
+                    (tenant, *map(int, rows))
+                )}
+
+            results = []
+            for row, distance in zip(rows, distances):
+                chunk = found.get(int(row))
+                if chunk is None:
+                    continue
+
+                result = {
+                    'uuid': chunk['uuid'],
+                    'document_id': chunk['document_id'],
+                    'content': chunk['content'],
+                    'page_number': chunk['page_number'],
+                    'chunk_index': chunk['chunk_index'],
+                    'element_type': chunk['element_type'],
+                    'score': float(distance),
+                    'filename': chunk['filename'] or 'unknown',
+                    'doc_type': chunk['doc_type'] or 'unknown',
+                }
+
+                if include_summary and chunk['filename'] is not None:
+                    result['context_summary'] = chunk['summary'] or ''
+
+                results.append(result)
+
+            logger.info(f'Найден {len(results)} релевантных чанков')
+            return results
+
+        except Exception as e:
+            logger.error(f'Ошибка поиска: {e}')
+            return []
+
+    def get_document_stats(self, tenant: Optional[str] = None) -> Dict[str, int]:
+        tenant = self._tenant(tenant)
+        with self._lock:
+            doc_count = self._db.execute('SELECT COUNT(*) FROM documents WHERE tenant = ?', (tenant,)).fetchone()[0]
+            chunk_count = self._db.execute('SELECT COUNT(*) FROM chunks WHERE tenant = ?', (tenant,)).fetchone()[0]
+
+        return {
+            'total_documents': doc_count,
+            'total_chunks': chunk_count,
+            'avg_chunks_per_doc': chunk_count / doc_count if doc_count > 0 else 0
+        }
+
+    def delete_document(self, doc_uuid: str, tenant: Optional[str] = None) -> bool:
+        tenant = self._tenant(tenant)
+        try:
+            with self._lock:
+                chunk_uuids = [r['uuid'] for r in self._db.execute(
+                    'SELECT uuid FROM chunks WHERE tenant = ? AND document_id = ?', (tenant, str(doc_uuid))
+                )]
+                self._delete_chunk_rows(tenant, self._chunk_rows(tenant, chunk_uuids))
+                self._db.execute('DELETE FROM documents WHERE tenant = ? AND uuid = ?', (tenant, str(doc_uuid)))
+                self._db.commit()
+
+            index_generation.bump()
+            logger.info(f'Документ {doc_uuid} и его чанки удалены')
+            return True
+
+        except Exception as e:
+            logger.error(f'Ошибка удаления документа: {e}')
+            return False
+
+    def list_tenants(self) -> Dict[str, str]:
+        with self._lock:
+            return {r['name']: r['status'] for r in self._db.execute('SELECT name, status FROM tenants')}
+
+    def set_tenant_activity(self, tenant: str, status: str = 'INACTIVE'):
+        status = status.upper()
+        if status not in ('ACTIVE', 'INACTIVE', 'OFFLOADED'):
+            raise ValueError(f'Неизвестный статус тенанта: {status}')
+
+        with self._lock:
+            if status != 'ACTIVE' and tenant in self._indexes:
+                self._indexes.pop(tenant).close()
+            self._db.execute('UPDATE tenants SET status = ? WHERE name = ?', (status, tenant))
+            self._db.commit()
+
+        logger.info(f'Тенант {tenant} переведен в статус {status}')
+
+    def close(self):
+        with self._lock:
+            for index in self._indexes.values():
+                index.close()
+            self._indexes.clear()
+            self._db.close()
+        logger.info('Локальное векторное хранилище закрыто')
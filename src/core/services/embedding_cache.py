@@ -0,0 +1,259 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Dict, Callable, Optional
+
+import numpy as np
+from loguru import logger
+
+from src.config import settings
+
+
+class EmbeddingCache:
+    def __init__(self, model_name: str = None, cache_dir: Path = None, max_mb: int = None):
+        self.model_name = model_name or settings.EMBEDDING_MODEL
+        self.cache_dir = Path(cache_dir or settings.EMBEDDING_CACHE_DIR)
+        self.max_bytes = (max_mb or settings.EMBEDDING_CACHE_MAX_MB) * 1024 * 1024
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        safe_name = ''.join(c if c.isalnum() else '_' for c in self.model_name)
+        self._vectors_path = self.cache_dir / f'{safe_name}.f32'
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.memmap] = None
+
+        self.hits = 0
+        self.misses = 0
+
+        self._db = sqlite3.connect(self.cache_dir / 'index.sqlite', check_same_thread=False)
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS entries (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                slot INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            );
+            CREATE INDEX IF NOT EXISTS entries_lru ON entries (model, last_used);
+            CREATE TABLE IF NOT EXISTS free_slots (
+                model TEXT NOT NULL,
+                slot INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS models (
+                model TEXT PRIMARY KEY,
+                dim INTEGER NOT NULL,
+                next_slot INTEGER NOT NULL
+            );
+        ''')
+        self._db.commit()
+
+        row = self._db.execute('SELECT dim FROM models WHERE model = ?', (self.model_name,)).fetchone()
+        self.dim = row[0] if row else None
+        if self.dim:
+            self._open_vectors()
+
+    @staticmethod
+    def text_key(text: str) -> str:
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    @property
+    def max_rows(self) -> int:
+        return max(1, self.max_bytes // (self.dim * 4))
+
+    def encode(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        if not texts:
+            # форма пустого результата та же, что и без кэша
+            return np.asarray(encode_fn(texts), dtype=np.float32)
+
+        keys = [self.text_key(text) for text in texts]
+        cached = self.get_many(keys)
+
+        miss_positions = [i for i, key in enumerate(keys) if key not in cached]
+        self.hits += len(texts) - len(miss_positions)
+        self.misses += len(miss_positions)
+
+        if miss_positions:
+            logger.info(f'Кэш эмбеддингов: {len(texts) - len(miss_positions)} попаданий, '
+                        f'{len(miss_positions)} промахов')
+            fresh = np.asarray(encode_fn([texts[i] for i in miss_positions]), dtype=np.float32)
+            self.put_many([keys[i] for i in miss_positions], fresh)
+        else:
+            logger.info(f'Кэш эмбеддингов: все {len(texts)} векторов найдены')
+            fresh = None
+
+        dim = self.dim if self.dim else 0
+        result = np.empty((len(texts), dim), dtype=np.float32)
+        for i, key in enumerate(keys):
+            if key in cached:
+                result[i] = cached[key]
+        if fresh is not None:
+            result[miss_positions] = fresh
+
+        return result
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        if not keys or self._vectors is None:
+            return {}
+
+        found = {}
+        with self._lock:
+            # другой процесс пишет строку memmap до своего коммита, поэтому поиск слота и копирование
+            # вектора идут под той же блокировкой записи, что и выделение слотов
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                rows = self._lookup(keys)
+                if rows:
+                    self._ensure_capacity(max(slot for _, slot in rows) + 1)
+                for text_hash, slot in rows:
+                    found[text_hash] = np.array(self._vectors[slot])
+
+                if found:
+                    now = time.time()
+                    self._db.executemany(
+                        'UPDATE entries SET last_used = ? WHERE model = ? AND text_hash = ?',
+                        [(now, self.model_name, key) for key in found]
+                    )
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+
+        return found
+
+    def put_many(self, keys: List[str], vectors: np.ndarray):
+        if not keys:
+            return
+
+        with self._lock:
+            # кэш может разделяться несколькими процессами: слоты выделяются под блокировкой записи
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                if self.dim is None:
+                    self.dim = int(vectors.shape[1])
+                    self._db.execute('INSERT OR IGNORE INTO models (model, dim, next_slot) VALUES (?, ?, 0)',
+                                     (self.model_name, self.dim))
+                    self._open_vectors()
+
+                unique = {}
+                for key, vector in zip(keys, vectors):
+                    unique[key] = vector
+                for text_hash in self._existing_keys(list(unique)):
+                    unique.pop(text_hash, None)
+
+                items = list(unique.items())[-self.max_rows:]
+                slots = self._allocate_slots(len(items))
+                for slot, (_, vector) in zip(slots, items):
+                    self._vectors[slot] = vector
+
+                now = time.time()
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO entries (model, text_hash, slot, last_used) VALUES (?, ?, ?, ?)',
+                    [(self.model_name, key, slot, now) for slot, (key, _) in zip(slots, items)]
+                )
+                self._vectors.flush()
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+
+    def _lookup(self, keys: List[str]) -> List[tuple]:
+        rows = []
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            rows.extend(self._db.execute(
+                f'SELECT text_hash, slot FROM entries WHERE model = ? AND text_hash IN ({",".join("?" * len(batch))})',
+                (self.model_name, *batch)
+            ).fetchall())
+        return rows
+
+    def _existing_keys(self, keys: List[str]) -> List[str]:
+        return [text_hash for text_hash, _ in self._lookup(keys)]
+
+    def _allocate_slots(self, count: int) -> List[int]:
+        total = self._db.execute('SELECT COUNT(*) FROM entries WHERE model = ?',
+                                 (self.model_name,)).fetchone()[0]
+        overflow = total + count - self.max_rows
+        if overflow > 0:
+            self._evict(overflow)
+
+        free = [slot for (slot,) in self._db.execute(
+            'SELECT slot FROM free_slots WHERE model = ? LIMIT ?', (self.model_name, count)
+        ).fetchall()]
+        if free:
+            self._db.execute(
+                f'DELETE FROM free_slots WHERE model = ? AND slot IN ({",".join("?" * len(free))})',
+                (self.model_name, *free)
+            )
+
+        needed = count - len(free)
+        if needed <= 0:
+            if free:
+                self._ensure_capacity(max(free) + 1)
+            return free
+
+        next_slot = self._db.execute('SELECT next_slot FROM models WHERE model = ?',
+                                     (self.model_name,)).fetchone()[0]
+        new_slots = list(range(next_slot, next_slot + needed))
+        self._db.execute('UPDATE models SET next_slot = ? WHERE model = ?',
+                         (next_slot + needed, self.model_name))
+        self._ensure_capacity(max(free + new_slots) + 1)
+
+        return free + new_slots
+
+    def _evict(self, count: int):
+        rows = self._db.execute(
+            'SELECT text_hash, slot FROM entries WHERE model = ? ORDER BY last_used LIMIT ?',
+            (self.model_name, count)
+        ).fetchall()
+        self._db.executemany('DELETE FROM entries WHERE model = ? AND text_hash = ?',
+                             [(self.model_name, text_hash) for text_hash, _ in rows])
+        self._db.executemany('INSERT INTO free_slots (model, slot) VALUES (?, ?)',
+                             [(self.model_name, slot) for _, slot in rows])
+        logger.debug(f'Кэш эмбеддингов: вытеснено {len(rows)} векторов')
+
+    def _open_vectors(self, min_rows: int = 0):
+        row_bytes = self.dim * 4
+        size = self._vectors_path.stat().st_size if self._vectors_path.exists() else 0
+        rows = max(size // row_bytes, min_rows, 1)
+
+        if size < rows * row_bytes:
+            with open(self._vectors_path, 'ab') as f:
+                f.truncate(rows * row_bytes)
+
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode='r+',
+                                  shape=(rows, self.dim))
+
+    def _ensure_capacity(self, rows: int):
+        if rows <= self._vectors.shape[0]:
+            return
+
+        mapped = self._vectors.shape[0]
+        self._vectors.flush()
+        self._vectors = None
+
+        # файл мог вырасти в другом процессе, тогда достаточно переоткрыть его с новым размером
+        self._open_vectors()
+        if rows <= self._vectors.shape[0]:
+            return
+
+        capacity = min(max(rows, mapped * 2, 1024), max(rows, self.max_rows))
+        self._vectors = None
+        self._open_vectors(min_rows=capacity)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._db.execute('SELECT COUNT(*) FROM entries WHERE model = ?',
+                                       (self.model_name,)).fetchone()[0]
+        return {
+            'entries': entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'size_bytes': self._vectors_path.stat().st_size if self._vectors_path.exists() else 0
+        }
+
+    def close(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+            self._db.close()
@@ -0,0 +1,85 @@
+import threading
+from typing import List
+
+import numpy as np
+from loguru import logger
+
+from src.config import settings
+
+
+class EmbeddingEngine:
+    def __init__(self, model, cache=None, token_budget: int = None, max_batch_size: int = None):
+        self.model = model
+        self.cache = cache
+        self.token_budget = token_budget or settings.EMBEDDING_TOKEN_BUDGET
+        self.max_batch_size = max_batch_size or settings.EMBEDDING_MAX_BATCH
+        self.max_seq_length = getattr(model, 'max_seq_length', None) or settings.EMBEDDING_MAX_TOKENS
+        self.dim = model.get_sentence_embedding_dimension()
+        self._lock = threading.Lock()
+
+    def encode_passages(self, texts: List[str]) -> np.ndarray:
+        if self.cache is not None:
+            return self.cache.encode(texts, self.encode)
+        return self.encode(texts)
+
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        return self.encode([f'query: {query}' for query in queries])
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        result = np.empty((len(texts), self.dim), dtype=np.float32)
+        if not texts:
+            return result
+
+        lengths = self._token_lengths(texts)
+        order = sorted(range(len(texts)), key=lambda i: lengths[i], reverse=True)
+
+        with self._lock:
+            for batch in self._make_batches(order, lengths):
+                result[batch] = self._encode_batch([texts[i] for i in batch])
+
+        return result
+
+    def _token_lengths(self, texts: List[str]) -> List[int]:
+        encoded = self.model.tokenizer(texts, add_special_tokens=True, truncation=True,
+                                       max_length=self.max_seq_length)['input_ids']
+        return [len(ids) for ids in encoded]
+
+    def _make_batches(self, order: List[int], lengths: List[int]) -> List[List[int]]:
+        batches = []
+        batch = []
+        batch_max = 0
+
+        for i in order:
+            longest = max(batch_max, lengths[i])
+            if batch and (longest * (len(batch) + 1) > self.token_budget
+                          or len(batch) >= self.max_batch_size):
+                batches.append(batch)
+                batch, longest = [], lengths[i]
+            batch.append(i)
+            batch_max = longest
+
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        try:
+            return self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True,
+                                     show_progress_bar=False).astype(np.float32, copy=False)
+        except RuntimeError as e:
+            if 'out of memory' not in str(e).lower() or len(texts) == 1:
+                raise
+
+            self.token_budget = max(self.max_seq_length, self.token_budget // 2)
+            logger.warning(f'Нехватка памяти при эмбеддинге, бюджет токенов снижен до {self.token_budget}')
+            self._empty_device_cache()
+
+            middle = len(texts) // 2
+            return np.concatenate([self._encode_batch(texts[:middle]), self._encode_batch(texts[middle:])])
+
+    @staticmethod
+    def _empty_device_cache():
+        import torch
+
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any
+
+from loguru import logger
+
+from src.config import settings
+from src.core.vector_store_base import vector_store_namespace
+
+
+class FileManifest:
+    def __init__(self, path: Path = None, namespace: str = None):
+        self.path = Path(path or settings.FILE_MANIFEST_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.namespace = namespace or vector_store_namespace()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        columns = {row[1] for row in self._db.execute('PRAGMA table_info(files)')}
+        if columns and 'store' not in columns:
+            # манифест - только кэш: старую схему без хранилища в ключе проще сбросить
+            logger.warning('Манифест файлов устаревшей схемы сброшен')
+            self._db.execute('DROP TABLE files')
+
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS files (
+                store TEXT NOT NULL,
+                path TEXT NOT NULL,
+                tenant TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                raw_hash TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                doc_uuid TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (store, path, tenant)
+            );
+            CREATE INDEX IF NOT EXISTS files_raw_hash ON files (store, tenant, raw_hash);
+            CREATE INDEX IF NOT EXISTS files_doc_uuid ON files (doc_uuid);
+        ''')
+        self._db.commit()
+
+    @staticmethod
+    def file_hash(file_path, block_size: int = 1 << 20) -> str:
+        sha = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            while block := f.read(block_size):
+                sha.update(block)
+        return sha.hexdigest()
+
+    @staticmethod
+    def _key(file_path, tenant: Optional[str]):
+        return str(Path(file_path).resolve()), tenant or settings.DEFAULT_TENANT
+
+    def lookup(self, file_path, tenant: Optional[str] = None) -> Dict[str, Any]:
+        path, tenant = self._key(file_path, tenant)
+        stat = os.stat(path)
+
+        with self._lock:
+            row = self._db.execute(
+                'SELECT size, mtime_ns, raw_hash, content_hash, doc_uuid FROM files '
+                'WHERE store = ? AND path = ? AND tenant = ?',
+                (self.namespace, path, tenant)
+            ).fetchone()
+
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            self.hits += 1
+            return {'status': 'unchanged', 'raw_hash': row[2], 'content_hash': row[3], 'doc_uuid': row[4]}
+
+        raw_hash = self.file_hash(path)
+        with self._lock:
+            if row and row[2] == raw_hash:
+                match = row[2:]
+            else:
+                match = self._db.execute(
+                    'SELECT raw_hash, content_hash, doc_uuid FROM files '
+                    'WHERE store = ? AND tenant = ? AND raw_hash = ? LIMIT 1',
+                    (self.namespace, tenant, raw_hash)
+                ).fetchone()
+
+            if match:
+                self._upsert(path, tenant, stat, raw_hash, match[1], match[2])
+                self._db.commit()
+
+        if match:
+            self.hits += 1
+            return {'status': 'unchanged', 'raw_hash': raw_hash, 'content_hash': match[1], 'doc_uuid': match[2]}
+
+        self.misses += 1
+        if row:
+            return {'status': 'modified', 'raw_hash': raw_hash, 'doc_uuid': row[4]}
+        return {'status': 'new', 'raw_hash': raw_hash}
+
+    def record(self, file_path, content_hash: str, doc_uuid: str,
+               tenant: Optional[str] = None, raw_hash: str = None):
+        path, tenant = self._key(file_path, tenant)
+        stat = os.stat(path)
+        raw_hash = raw_hash or self.file_hash(path)
+
+        with self._lock:
+            self._upsert(path, tenant, stat, raw_hash, content_hash, doc_uuid)
+            self._db.commit()
+
+    def _upsert(self, path: str, tenant: str, stat: os.stat_result, raw_hash: str,
+                content_hash: str, doc_uuid: str):
+        self._db.execute(
+            'INSERT OR REPLACE INTO files '
+            '(store, path, tenant, size, mtime_ns, raw_hash, content_hash, doc_uuid, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (self.namespace, path, tenant, stat.st_size, stat.st_mtime_ns, raw_hash, content_hash, doc_uuid,
+             time.time())
+        )
+
+    def forget_document(self, doc_uuid: str):
+        with self._lock:
+            self._db.execute('DELETE FROM files WHERE store = ? AND doc_uuid = ?', (self.namespace, doc_uuid))
+            self._db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._db.execute('SELECT COUNT(*) FROM files WHERE store = ?', (self.namespace,)).fetchone()[0]
+        return {
+            'entries': entries,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
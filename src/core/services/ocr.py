@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import defaultdict
+from typing import List, Tuple, Any, Dict
+
+import numpy as np
+from loguru import logger
+
+from src.config import settings
+
+
+class OCRService:
+    def __init__(self, languages: List[str] = None, max_side: int = None, batch_size: int = None):
+        self.languages = languages or settings.OCR_LANGUAGES
+        self.max_side = max_side or settings.OCR_MAX_SIDE
+        self.batch_size = batch_size or settings.OCR_BATCH_SIZE
+        self._reader = None
+        self._lock = threading.Lock()
+
+        self.pages = 0
+        self.seconds = 0.0
+
+    def _get_reader(self):
+        if self._reader is None:
+            import easyocr
+            import torch
+
+            logger.info(f'Загрузка моделей easyocr ({", ".join(self.languages)})...')
+            self._reader = easyocr.Reader(self.languages, gpu=torch.cuda.is_available())
+        return self._reader
+
+    def _prepare(self, image: Any) -> Tuple[np.ndarray, float]:
+        from PIL import Image
+
+        if isinstance(image, np.ndarray):
+            pil_image = Image.fromarray(image)
+        elif isinstance(image, Image.Image):
+            pil_image = image
+        else:
+            pil_image = Image.open(image)
+
+        pil_image = pil_image.convert('RGB')
+        scale = 1.0
+        if max(pil_image.size) > self.max_side:
+            scale = self.max_side / max(pil_image.size)
+            pil_image = pil_image.resize(
+                (round(pil_image.width * scale), round(pil_image.height * scale)),
+                Image.LANCZOS
+            )
+
+        return np.asarray(pil_image), scale
+
+    def readtext_batch(self, images: List[Any]) -> List[List[Tuple[list, str]]]:
+        if not images:
+            return []
+
+        start = time.perf_counter()
+        prepared = [self._prepare(image) for image in images]
+
+        groups = defaultdict(list)
+        for i, (array, _) in enumerate(prepared):
+            groups[array.shape].append(i)
+
+        results: List[List[Tuple[list, str]]] = [[] for _ in images]
+
+        with self._lock:
+            reader = self._get_reader()
+            for indices in groups.values():
+                for batch_start in range(0, len(indices), self.batch_size):
+                    batch = indices[batch_start:batch_start + self.batch_size]
+
+                    if len(batch) == 1:
+                        batch_results = [reader.readtext(prepared[batch[0]][0], paragraph=True)]
+                    else:
+                        batch_results = reader.readtext_batched(
+                            [prepared[i][0] for i in batch],
+                            paragraph=True,
+                            batch_size=len(batch)
+                        )
+
+                    for i, page_results in zip(batch, batch_results):
+                        results[i] = self._rescale(page_results, prepared[i][1])
+
+        elapsed = time.perf_counter() - start
+        self.pages += len(images)
+        self.seconds += elapsed
+        logger.info(f'OCR: {len(images)} изображений за {elapsed:.1f} с '
+                    f'({len(images) / elapsed:.2f} стр/с)')
+
+        return results
+
+    @staticmethod
+    def _rescale(page_results, scale: float) -> List[Tuple[list, str]]:
+        if scale == 1.0:
+            return [(bbox, text) for bbox, text in page_results]
+        return [
+            ([(x / scale, y / scale) for x, y in bbox], text)
+            for bbox, text in page_results
+        ]
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'pages': self.pages,
+            'seconds': round(self.seconds, 2),
+            'pages_per_sec': round(self.pages / self.seconds, 3) if self.seconds else 0.0
+        }
@@ -0,0 +1,106 @@
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Hashable, Optional, Dict
+
+from loguru import logger
+
+from src.config import settings
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r'\s+', ' ', query).strip().rstrip('?!. ').lower()
+
+
+class IndexGeneration:
+    def __init__(self, path: Path = None):
+        self.path = Path(path or settings.INDEX_GENERATION_PATH)
+        self._local = 0
+
+    def current(self) -> int:
+        try:
+            return int(self.path.read_text() or 0)
+        except (FileNotFoundError, ValueError):
+            return self._local
+
+    def bump(self) -> int:
+        value = max(time.time_ns(), self.current() + 1)
+        self._local = value
+
+        # файл делят API и CLI-загрузка: имя временного файла уникально между процессами,
+        # а сбой записи не должен ронять уже выполненную запись в хранилище
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=self.path.parent, prefix=f'{self.path.name}.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    f.write(str(value))
+                os.replace(tmp_name, self.path)
+            finally:
+                if os.path.exists(tmp_name):
+                    os.unlink(tmp_name)
+        except OSError as e:
+            logger.error(f'Не удалось обновить поколение индекса {self.path}: {e}')
+        return value
+
+
+class TTLLRUCache:
+    def __init__(self, maxsize: int, ttl: float, generation: IndexGeneration = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation = generation
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._seen_generation = generation.current() if generation else None
+
+        self.hits = 0
+        self.misses = 0
+
+    def _check_generation(self):
+        if self.generation is None:
+            return
+        current = self.generation.current()
+        if current != self._seen_generation:
+            self._data.clear()
+            self._seen_generation = current
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            self._check_generation()
+            item = self._data.get(key)
+
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._check_generation()
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'size': len(self._data),
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+index_generation = IndexGeneration()
@@ -0,0 +1,223 @@
+import gc
+import sys
+import threading
+from typing import Dict, Tuple, Iterable, Any
+
+from loguru import logger
+
+from src.config import settings
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._embedder = None
+        self._embedding_engine = None
+        self._embedding_cache = None
+        self._llms: Dict[Tuple[str, float], object] = {}
+        self._vector_store = None
+        self._summarizer = None
+        self._ocr = None
+        self._summary_cache = None
+        self._file_manifest = None
+        self._tokenizer = None
+        self._chunk_assembler = None
+        self._llm_override = None
+
+    def get_embedder(self):
+        with self._lock:
+            if self._embedder is None:
+                from sentence_transformers import SentenceTransformer
+
+                logger.info(f'Загрузка модели эмбеддингов {settings.EMBEDDING_MODEL}...')
+                self._embedder = SentenceTransformer(settings.EMBEDDING_MODEL, device=settings.EMBEDDING_DEVICE)
+            return self._embedder
+
+    def get_embedding_engine(self):
+        with self._lock:
+            if self._embedding_engine is None:
+                from src.core.services.embedding_engine import EmbeddingEngine
+
+                self._embedding_engine = EmbeddingEngine(self.get_embedder(), self.get_embedding_cache())
+            return self._embedding_engine
+
+    def get_tokenizer(self):
+        with self._lock:
+            if self._tokenizer is None:
+                if self._embedder is not None:
+                    self._tokenizer = self._embedder.tokenizer
+                else:
+                    from transformers import AutoTokenizer
+
+                    self._tokenizer = AutoTokenizer.from_pretrained(settings.EMBEDDING_MODEL)
+            return self._tokenizer
+
+    def get_chunk_assembler(self):
+        with self._lock:
+            if self._chunk_assembler is None:
+                from src.core.chunker import ChunkAssembler
+
+                self._chunk_assembler = ChunkAssembler(self.get_tokenizer())
+            return self._chunk_assembler
+
+    def get_embedding_cache(self):
+        if not settings.EMBEDDING_CACHE_ENABLED:
+            return None
+
+        with self._lock:
+            if self._embedding_cache is None:
+                from src.core.services.embedding_cache import EmbeddingCache
+
+                self._embedding_cache = EmbeddingCache(settings.EMBEDDING_MODEL)
+            return self._embedding_cache
+
+    def get_llm(self, model_name: str = None, temperature: float = .1):
+        model_name = model_name or settings.LLM_MODEL
+        key = (model_name, temperature)
+
+        with self._lock:
+            if self._llm_override is not None:
+                return self._llm_override
+            if key not in self._llms:
+                from langchain_ollama import ChatOllama
+
+                self._llms[key] = ChatOllama(
+                    model=model_name,
+                    temperature=temperature,
+                    base_url=settings.OLLAMA_BASE_URL
+                )
+            return self._llms[key]
+
+    def get_vector_store(self):
+        with self._lock:
+            if self._vector_store is None:
+                from src.core.vector_store_base import create_vector_store
+
+                self._vector_store = create_vector_store()
+            return self._vector_store
+
+    def get_summarizer(self):
+        with self._lock:
+            if self._summarizer is None:
+                from src.core.services.summarizer import SummarizerService
+
+                self._summarizer = SummarizerService()
+            return self._summarizer
+
+    def get_summary_cache(self):
+        if not settings.SUMMARY_CACHE_ENABLED:
+            return None
+
+        with self._lock:
+            if self._summary_cache is None:
+                from src.core.services.summary_cache import SummaryCache
+
+                self._summary_cache = SummaryCache()
+            return self._summary_cache
+
+    def get_file_manifest(self):
+        if not settings.FILE_MANIFEST_ENABLED:
+            return None
+
+        with self._lock:
+            if self._file_manifest is None:
+                from src.core.services.file_manifest import FileManifest
+
+                self._file_manifest = FileManifest()
+            return self._file_manifest
+
+    def get_ocr(self):
+        with self._lock:
+            if self._ocr is None:
+                from src.core.services.ocr import OCRService
+
+                self._ocr = OCRService()
+            return self._ocr
+
+    def warm_up(self, embedder: bool = True, vector_store: bool = True,
+                llm_models: Iterable[str] = ()):
+        if embedder:
+            self.get_embedder()
+        if vector_store:
+            self.get_vector_store()
+        for model_name in llm_models:
+            self.get_llm(model_name)
+        logger.info('Реестр моделей прогрет')
+
+    def override(self, **components):
+        with self._lock:
+            unknown = set(components) - {'llm', 'embedder', 'embedding_engine', 'tokenizer',
+                                         'vector_store', 'summarizer', 'ocr'}
+            if unknown:
+                raise ValueError(f'Неизвестный компонент реестра: {", ".join(sorted(unknown))}')
+
+            # сначала сбрасываем производные компоненты, чтобы не затереть подмененные в том же вызове
+            if 'llm' in components:
+                self._llms.clear()
+                self._summarizer = None
+            if 'embedder' in components:
+                self._embedding_engine = None
+                self._tokenizer = None
+            if 'embedder' in components or 'tokenizer' in components:
+                self._chunk_assembler = None
+
+            for name, component in components.items():
+                if name == 'llm':
+                    self._llm_override = component
+                else:
+                    setattr(self, f'_{name}', component)
+
+        logger.info(f'Подменены компоненты: {", ".join(components)}')
+
+    def release(self, *components: str):
+        components = components or ('embedder', 'tokenizer', 'embedding_cache', 'llm', 'vector_store',
+                                    'summarizer', 'summary_cache', 'file_manifest', 'ocr')
+
+        with self._lock:
+            if 'vector_store' in components and self._vector_store is not None:
+                self._vector_store.close()
+                self._vector_store = None
+            if 'embedding_cache' in components and self._embedding_cache is not None:
+                self._embedding_cache.close()
+                self._embedding_cache = None
+                self._embedding_engine = None
+            if 'llm' in components:
+                self._llms.clear()
+                self._llm_override = None
+            if 'summarizer' in components:
+                self._summarizer = None
+            if 'summary_cache' in components and self._summary_cache is not None:
+                self._summary_cache.close()
+                self._summary_cache = None
+            if 'file_manifest' in components and self._file_manifest is not None:
+                self._file_manifest.close()
+                self._file_manifest = None
+            if 'ocr' in components:
+                self._ocr = None
+            if 'tokenizer' in components:
+                self._tokenizer = None
+                self._chunk_assembler = None
+            if 'embedder' in components and self._embedder is not None:
+                self._embedder = None
+                self._embedding_engine = None
+                gc.collect()
+                torch = sys.modules.get('torch')
+                if torch is not None and torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+
+        logger.info(f'Освобождены ресурсы: {", ".join(components)}')
+
+    def loaded(self) -> Dict[str, Any]:
+        return {
+            'embedder': self._embedder is not None,
+            'embedding_cache': self._embedding_cache is not None,
+            'llm': len(self._llms),
+            'vector_store': self._vector_store is not None,
+            'summarizer': self._summarizer is not None,
+            'summary_cache': self._summary_cache is not None,
+            'file_manifest': self._file_manifest is not None,
+            'ocr': self._ocr is not None,
+        }
+
+
+registry = ModelRegistry()
@@ -0,0 +1,76 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, List, Tuple
+
+MAX_SPANS = 1024
+
+
+class StageTimer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: Dict[str, list] = {}
+        self._spans: Dict[str, List[Tuple[float, float]]] = {}
+
+    @contextmanager
+    def stage(self, name: str, items: int = 1):
+        started = time.time()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start, items, started)
+
+    def add(self, name: str, seconds: float, items: int = 1, started: float = None):
+        if started is None:
+            started = time.time() - seconds
+
+        with self._lock:
+            # seconds, items, calls, самый долгий вызов, стеновое время уже свернутых интервалов
+            totals = self._totals.setdefault(name, [0.0, 0, 0, 0.0, 0.0])
+            totals[0] += seconds
+            totals[1] += items
+            totals[2] += 1
+            totals[3] = max(totals[3], seconds)
+
+            spans = self._spans.setdefault(name, [])
+            spans.append((started, started + seconds))
+            if len(spans) > MAX_SPANS:
+                self._fold(name, totals)
+
+    def _fold(self, name: str, totals: list):
+        spans = self._merge(self._spans[name])
+        # интервалы, закончившиеся раньше самого долгого вызова, уже не пересекутся с новыми
+        horizon = spans[-1][1] - totals[3]
+        totals[4] += sum(end - start for start, end in spans if end < horizon)
+        self._spans[name] = [span for span in spans if span[1] >= horizon]
+
+    def reset(self):
+        with self._lock:
+            self._totals.clear()
+            self._spans.clear()
+
+    @staticmethod
+    def _merge(spans: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+        merged = []
+        for start, end in sorted(spans):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            result = {}
+            for name, (seconds, items, calls, _, folded) in self._totals.items():
+                # параллельные вызовы стадии перекрываются, стеновое время - длина объединения интервалов
+                wall = folded + sum(end - start for start, end in self._merge(self._spans.get(name, [])))
+                result[name] = {
+                    'seconds': round(seconds, 3),
+                    'wall_seconds': round(wall, 3),
+                    'items': items,
+                    'calls': calls,
+                    'items_per_sec': round(items / wall, 2) if wall else 0
+                }
+            return result
@@ -1,53 +1,173 @@
 import time
-from typing import List
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from itertools import chain
+from typing import List, Iterable, Iterator, Dict, Tuple
 
 from loguru import logger
 
-from langchain_ollama import ChatOllama
 from langchain.schema import HumanMessage, SystemMessage
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
+from src.core.services.registry import registry
+from src.core.services.summary_cache import SummaryCache
+from src.config import settings
+
+PROMPT_VERSION = '1'
+SINGLE_PASS_LIMIT = 15000
+MAX_REDUCE_DEPTH = 3
+
+
 class SummarizerService:
-    def __init__(self, model_name: str = 'gemma3:4b'):
-        self.llm = ChatOllama(
-            model=model_name,
-            temperature=.2,
-            base_url='http://localhost:11434'
-        )
+    def __init__(self, model_name: str = None, concurrency: int = None):
+        self.model_name = model_name or settings.LLM_MODEL
+        self.llm = registry.get_llm(self.model_name, temperature=.2)
+        self.concurrency = concurrency or settings.SUMMARY_CONCURRENCY
+        self.cache = registry.get_summary_cache()
 
+        self.chunk_size = 8000
         self.splitter = RecursiveCharacterTextSplitter(
-            chunk_size=8000,
+            chunk_size=self.chunk_size,
             chunk_overlap=500,
             separators=['\n\n', '\n', '. ', ' ', '']
         )
 
-    def generate_summary(self, full_text: str):
+    def generate_summary(self, full_text: str, content_hash: str = None):
+        content_hash = content_hash or SummaryCache.text_hash(full_text)
+        cached = self._cache_get('document', content_hash)
+        if cached is not None:
+            logger.info('Саммари документа найден в кэше')
+            return cached
+
+        summary, complete = self._generate_summary(full_text)
+        if complete:
+            self._cache_put('document', content_hash, summary)
+        return summary
+
+    def _generate_summary(self, full_text: str):
         logger.info(f'Начало суммаризации текста длиной {len(full_text)} символов...')
 
-        if len(full_text) < 15000:
-            return self._summarize_chunk(full_text, is_final=True)
+        if len(full_text) < SINGLE_PASS_LIMIT:
+            return self._summarize_chunk(full_text, is_final=True), True
 
         logger.info('Документ большой. Применяем стратегию Map-Reduce.')
 
         chunks = self.splitter.split_text(full_text)
-        intermediate_summaries = []
-
         logger.info(f'Разбито на {len(chunks)} частей. Обработка...')
 
-        for i, chunk in enumerate(chunks):
-            logger.debug(f'Обработка части {i+1}/{len(chunks)}...')
-            try:
-                summary = self._summarize_chunk(chunk, is_final=False)
-                intermediate_summaries.append(summary)
-            except Exception as e:
-                logger.error(f'Ошибка при обработке части {i+1}: {e}')
-                continue
-
-        combined_text = '\n\n'.join(intermediate_summaries)
-        logger.info(f'Финальная сборка саммари из {len(intermediate_summaries)} фрагментов')
+        return self._map_reduce(chunks)
+
+    def generate_summary_stream(self, parts: Iterable[str], content_hash: str = None):
+        if content_hash:
+            cached = self._cache_get('document', content_hash)
+            if cached is not None:
+                logger.info('Саммари документа найден в кэше')
+                return cached
+
+        summary, complete = self._generate_summary_stream(parts)
+        if content_hash and complete:
+            self._cache_put('document', content_hash, summary)
+        return summary
+
+    def _generate_summary_stream(self, parts: Iterable[str]):
+        parts = iter(parts)
+        head = []
+        head_length = 0
+
+        for part in parts:
+            head.append(part)
+            head_length += len(part) + 2
+            if head_length >= SINGLE_PASS_LIMIT:
+                break
+        else:
+            return self._generate_summary('\n\n'.join(head))
+
+        logger.info('Документ большой. Применяем потоковую стратегию Map-Reduce.')
+        return self._map_reduce(self._iter_splits(chain(['\n\n'.join(head)], parts)))
+
+    def _iter_splits(self, parts: Iterable[str]) -> Iterator[str]:
+        buffer = ''
+        for part in parts:
+            buffer = f'{buffer}\n\n{part}' if buffer else part
+            if len(buffer) >= 2 * self.chunk_size:
+                splits = self.splitter.split_text(buffer)
+                yield from splits[:-1]
+                buffer = splits[-1]
+
+        if buffer:
+            yield from self.splitter.split_text(buffer)
+
+    def _map_reduce(self, chunks: Iterable[str]):
+        intermediate_summaries, failed = self._map_phase(chunks)
+        summary, complete = self._reduce(intermediate_summaries)
+        if failed:
+            # саммари без части фрагментов не кэшируем, иначе пропуски закрепятся до смены промпта
+            logger.warning(f'Саммари собран без {failed} фрагментов и не будет сохранен в кэш')
+        return summary, complete and not failed
+
+    def _map_phase(self, chunks: Iterable[str]) -> Tuple[List[str], int]:
+        results: Dict[int, str] = {}
+        in_flight = {}
+        failed = 0
+
+        def collect(futures):
+            nonlocal failed
+            for future in futures:
+                i = in_flight.pop(future)
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    logger.error(f'Ошибка при обработке части {i+1}: {e}')
+                    failed += 1
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for i, chunk in enumerate(chunks):
+                if len(in_flight) >= self.concurrency * 2:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+
+                logger.debug(f'Обработка части {i+1}...')
+                in_flight[pool.submit(self._summarize_part, chunk)] = i
+
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+
+        return [results[i] for i in sorted(results)], failed
+
+    def _reduce(self, summaries: List[str], depth: int = 0):
+        combined_text = '\n\n'.join(summaries)
+
+        if len(combined_text) >= SINGLE_PASS_LIMIT and depth < MAX_REDUCE_DEPTH:
+            logger.info(f'Промежуточные саммари ({len(combined_text)} символов) не помещаются '
+                        f'в контекст. Уровень свёртки {depth + 1}')
+            parts = self.splitter.split_text(combined_text)
+            reduced, failed = self._map_phase(parts)
+            summary, complete = self._reduce(reduced, depth + 1)
+            return summary, complete and not failed
+
+        logger.info(f'Финальная сборка саммари из {len(summaries)} фрагментов')
 
         final_summary = self._summarize_chunk(combined_text, is_final=True)
-        return final_summary
+        return final_summary, True
+
+    def _summarize_part(self, chunk: str):
+        part_hash = SummaryCache.text_hash(chunk)
+        cached = self._cache_get('part', part_hash)
+        if cached is not None:
+            return cached
+
+        summary = self._summarize_chunk(chunk, is_final=False)
+        self._cache_put('part', part_hash, summary)
+        return summary
+
+    def _cache_get(self, kind: str, text_hash: str):
+        if self.cache is None:
+            return None
+        return self.cache.get(kind, text_hash, self.model_name, PROMPT_VERSION)
+
+    def _cache_put(self, kind: str, text_hash: str, summary: str):
+        if self.cache is not None:
+            self.cache.put(kind, text_hash, self.model_name, PROMPT_VERSION, summary)
 
     def _summarize_chunk(self, text: str, is_final: bool = False):
         if is_final:
@@ -72,4 +192,7 @@ class SummarizerService:
 
         return self.llm.invoke(messages).content
 
-summarizer = SummarizerService()
\ No newline at end of file
+def __getattr__(name):
+    if name == 'summarizer':
+        return registry.get_summarizer()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,71 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict
+
+from src.config import settings
+
+
+class SummaryCache:
+    def __init__(self, path: Path = None):
+        self.path = Path(path or settings.SUMMARY_CACHE_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS summaries (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        ''')
+        self._db.commit()
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def make_key(kind: str, text_hash: str, model_name: str, prompt_version: str) -> str:
+        return f'{kind}:{model_name}:{prompt_version}:{text_hash}'
+
+    def get(self, kind: str, text_hash: str, model_name: str, prompt_version: str) -> Optional[str]:
+        key = self.make_key(kind, text_hash, model_name, prompt_version)
+        with self._lock:
+            row = self._db.execute('SELECT summary FROM summaries WHERE key = ?', (key,)).fetchone()
+            counters = self.hits if row else self.misses
+            counters[kind] = counters.get(kind, 0) + 1
+
+        return row[0] if row else None
+
+    def put(self, kind: str, text_hash: str, model_name: str, prompt_version: str, summary: str):
+        if not summary:
+            return
+
+        key = self.make_key(kind, text_hash, model_name, prompt_version)
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO summaries (key, kind, summary, created_at) VALUES (?, ?, ?, ?)',
+                (key, kind, summary, time.time())
+            )
+            self._db.commit()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            entries = dict(self._db.execute('SELECT kind, COUNT(*) FROM summaries GROUP BY kind').fetchall())
+        return {
+            'entries': entries,
+            'hits': dict(self.hits),
+            'misses': dict(self.misses)
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -2,14 +2,83 @@ from typing import List, Optional, Dict, Any
 import weaviate
 from weaviate.classes.config import Configure, Property, DataType, ReferenceProperty
 from weaviate.classes.query import MetadataQuery, Filter
+from weaviate.classes.tenants import Tenant, TenantActivityStatus
 from loguru import logger
 from datetime import datetime
 from zoneinfo import ZoneInfo
-import hashlib
-
-
-class VectorStoreManager:
-    def __init__(self):
+import time
+
+import numpy as np
+
+from src.core.services.query_cache import TTLLRUCache, index_generation
+from src.core.vector_store_base import BaseVectorStore
+from src.config import settings
+
+
+def default_index_config() -> Dict[str, Any]:
+    return {
+        'type': settings.VECTOR_INDEX_TYPE,
+        'ef': settings.HNSW_EF,
+        'ef_construction': settings.HNSW_EF_CONSTRUCTION,
+        'max_connections': settings.HNSW_MAX_CONNECTIONS,
+        'compression': settings.VECTOR_COMPRESSION,
+        'rescore_limit': settings.VECTOR_RESCORE_LIMIT,
+        'training_limit': settings.VECTOR_TRAINING_LIMIT,
+        'pq_segments': settings.PQ_SEGMENTS,
+        'flat_threshold': settings.DYNAMIC_INDEX_THRESHOLD,
+    }
+
+
+def build_vector_index_config(index_config: Dict[str, Any] = None):
+    config = {**default_index_config(), **(index_config or {})}
+    index_type = config['type']
+    compression = config.get('compression')
+    quantizer = Configure.VectorIndex.Quantizer
+
+    if index_type == 'flat':
+        if compression not in (None, 'bq'):
+            raise ValueError(f'Flat-индекс поддерживает только BQ-сжатие, получено: {compression}')
+        return Configure.VectorIndex.flat(
+            quantizer=quantizer.bq(rescore_limit=config.get('rescore_limit')) if compression else None
+        )
+
+    if compression == 'pq':
+        hnsw_quantizer = quantizer.pq(segments=config.get('pq_segments') or None,
+                                      training_limit=config.get('training_limit'))
+    elif compression == 'bq':
+        hnsw_quantizer = quantizer.bq(rescore_limit=config.get('rescore_limit'))
+    elif compression == 'sq':
+        hnsw_quantizer = quantizer.sq(rescore_limit=config.get('rescore_limit'),
+                                      training_limit=config.get('training_limit'))
+    elif compression is None:
+        hnsw_quantizer = None
+    else:
+        raise ValueError(f'Неизвестный тип сжатия: {compression}')
+
+    hnsw = Configure.VectorIndex.hnsw(
+        ef=config.get('ef'),
+        ef_construction=config.get('ef_construction'),
+        max_connections=config.get('max_connections'),
+        quantizer=hnsw_quantizer
+    )
+
+    if index_type == 'dynamic':
+        return Configure.VectorIndex.dynamic(
+            threshold=config.get('flat_threshold'),
+            hnsw=hnsw,
+            flat=Configure.VectorIndex.flat()
+        )
+    if index_type != 'hnsw':
+        raise ValueError(f'Неизвестный тип индекса: {index_type}')
+    return hnsw
+
+
+class VectorStoreManager(BaseVectorStore):
+    def __init__(self, index_config: Optional[Dict[str, Any]] = None, multi_tenancy: bool = None):
+        self.index_config = index_config
+        self.multi_tenancy = settings.MULTI_TENANCY if multi_tenancy is None else multi_tenancy
+        self.parent_cache = TTLLRUCache(settings.PARENT_CACHE_SIZE, settings.PARENT_CACHE_TTL,
+                                        generation=index_generation)
         try:
             self.client = weaviate.connect_to_local(port=8080, grpc_port=50051)
             logger.info('Подключение к Weaviate установлено')
@@ -18,12 +87,29 @@ class VectorStoreManager:
             raise e
         self._setup_schema()
 
+    def _collection_options(self) -> Dict[str, Any]:
+        if self.multi_tenancy:
+            return {'multi_tenancy_config': Configure.multi_tenancy(
+                enabled=True, auto_tenant_creation=True, auto_tenant_activation=True
+            )}
+        return {'sharding_config': Configure.sharding(desired_count=settings.WEAVIATE_SHARDS)}
+
+    def _collection(self, name: str, tenant: Optional[str] = None):
+        collection = self.client.collections.get(name)
+        if self.multi_tenancy:
+            return collection.with_tenant(tenant or settings.DEFAULT_TENANT)
+        if tenant and tenant != settings.DEFAULT_TENANT:
+            # без multi-tenancy коллекция общая, молча отдать чужие документы нельзя
+            raise ValueError(f'Тенант {tenant} указан, но MULTI_TENANCY отключен')
+        return collection
+
     def _setup_schema(self):
         if not self.client.collections.exists('DocumentObject'):
             self.client.collections.create(
                 name='DocumentObject',
                 description='Родительский объект документа с саммари и хешем',
                 vectorizer_config=Configure.Vectorizer.none(),
+                **self._collection_options(),
                 properties=[
                     Property(name='filename', data_type=DataType.TEXT),
                     Property(name='doc_type', data_type=DataType.TEXT),
@@ -39,31 +125,97 @@ class VectorStoreManager:
             logger.info('Коллекция DocumentObject создана')
 
         if not self.client.collections.exists('DocumentChunk'):
-            self.client.collections.create(
-                name='DocumentChunk',
-                description='Фрагменты документов с привязкой к родителю',
-                vectorizer_config=Configure.Vectorizer.none(),
-                properties=[
-                    Property(name='content', data_type=DataType.TEXT),
-                    Property(name='page_number', data_type=DataType.INT),
-                    Property(name='chunk_index', data_type=DataType.INT),
-                    Property(name='element_type', data_type=DataType.TEXT)
-                ],
-                references=[
-                    ReferenceProperty(
-                        name='hasDocument',
-                        target_collection='DocumentObject'
-                    )
-                ]
-            )
-            logger.info('Коллекция DocumentChunk создана')
-
-    @staticmethod
-    def calculate_content_hash(text: str):
-        return hashlib.sha256(text.encode('utf-8')).hexdigest()
-
-    def document_exists(self, content_hash: str) -> Optional[Dict[str, Any]]:
-        collection = self.client.collections.get('DocumentObject')
+            index_config = {**default_index_config(), **(self.index_config or {})}
+            try:
+                self._create_chunk_collection(index_config)
+            except Exception as e:
+                if index_config['type'] == 'dynamic':
+                    raise RuntimeError('Не удалось создать dynamic-индекс: он работает только при '
+                                       'ASYNC_INDEXING=true в окружении Weaviate') from e
+                raise
+            logger.info(f'Коллекция DocumentChunk создана (индекс: {index_config["type"]}, '
+                        f'сжатие: {index_config["compression"] or "нет"})')
+
+        self._migrate_schema()
+
+    def _create_chunk_collection(self, index_config: Dict[str, Any]):
+        self.client.collections.create(
+            name='DocumentChunk',
+            description='Фрагменты документов с привязкой к родителю',
+            vectorizer_config=Configure.Vectorizer.none(),
+            vector_index_config=build_vector_index_config(index_config),
+            **self._collection_options(),
+            properties=[
+                Property(name='content', data_type=DataType.TEXT),
+                Property(name='page_number', data_type=DataType.INT),
+                Property(name='chunk_index', data_type=DataType.INT),
+                Property(name='element_type', data_type=DataType.TEXT),
+                Property(name='chunk_hash', data_type=DataType.TEXT),
+                Property(name='document_id', data_type=DataType.UUID, index_filterable=True),
+            ],
+            references=[
+                ReferenceProperty(
+                    name='hasDocument',
+                    target_collection='DocumentObject'
+                )
+            ]
+        )
+
+    def _migrate_schema(self):
+        required = {
+            'DocumentChunk': [
+                Property(name='chunk_hash', data_type=DataType.TEXT),
+                Property(name='document_id', data_type=DataType.UUID, index_filterable=True),
+            ],
+        }
+
+        for name, properties in required.items():
+            collection = self.client.collections.get(name)
+            existing = {prop.name for prop in collection.config.get().properties}
+            for prop in properties:
+                if prop.name in existing:
+                    continue
+                try:
+                    collection.config.add_property(prop)
+                except Exception:
+                    # свойство мог добавить другой процесс, стартовавший одновременно
+                    if prop.name not in {p.name for p in collection.config.get().properties}:
+                        raise
+                    continue
+
+                logger.info(f'В коллекцию {name} добавлено свойство {prop.name}')
+                if prop.name == 'document_id':
+                    logger.warning('У ранее загруженных чанков нет document_id, '
+                                   'запустите scripts/migrate_document_ids.py')
+
+    def backfill_document_ids(self, tenant: Optional[str] = None, page_size: int = 1000) -> int:
+        doc_collection = self._collection('DocumentObject', tenant)
+        chunk_collection = self._collection('DocumentChunk', tenant)
+        updated = 0
+
+        for doc in doc_collection.iterator(return_properties=[]):
+            offset = 0
+            while True:
+                response = chunk_collection.query.fetch_objects(
+                    filters=Filter.by_ref('hasDocument').by_id().equal(doc.uuid),
+                    return_properties=['document_id'],
+                    limit=page_size,
+                    offset=offset
+                )
+                for obj in response.objects:
+                    if not obj.properties.get('document_id'):
+                        chunk_collection.data.update(uuid=obj.uuid, properties={'document_id': doc.uuid})
+                        updated += 1
+
+                if len(response.objects) < page_size:
+                    break
+                offset += page_size
+
+        logger.info(f'Заполнен document_id у {updated} чанков')
+        return updated
+
+    def document_exists(self, content_hash: str, tenant: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        collection = self._collection('DocumentObject', tenant)
         try:
             response = collection.query.fetch_objects(
                 filters=Filter.by_property('content_hash').equal(content_hash),
@@ -86,15 +238,15 @@ class VectorStoreManager:
 
     def create_document_object(
             self, filename: str, summary: str, content_hash: str, doc_type: str = 'unknown',
-            file_size: int = 0, total_pages: int = 0, total_chunks: int = 0
+            file_size: int = 0, total_pages: int = 0, total_chunks: int = 0, tenant: Optional[str] = None
     ) -> str:
-        existing = self.document_exists(content_hash)
+        existing = self.document_exists(content_hash, tenant)
         if existing:
             logger.warning(f'Документ уже существует в базе: {existing["filename"]} '
                            f'(добавлен {existing["added_at"]}). Пропускаем загрузку.')
             return existing['uuid']
 
-        collection = self.client.collections.get('DocumentObject')
+        collection = self._collection('DocumentObject', tenant)
         now = datetime.now(ZoneInfo(key='Europe/Moscow')).isoformat()
 
         try:
@@ -110,6 +262,7 @@ class VectorStoreManager:
                 'updated_at': now
             })
 
+            index_generation.bump()
             logger.success(f'Документ {filename} успешно добавлен | UUID: {uuid}')
             return str(uuid)
 
@@ -117,64 +270,204 @@ class VectorStoreManager:
             logger.error(f'Ошибка при создании документа: {e}')
             raise e
 
-    def upsert_chunks_linked(self, chunks_data: List[Dict[str, Any]],
-                             vectors: List[List[float]], doc_uuid: str):
+    def get_document(self, doc_uuid: str, tenant: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        collection = self._collection('DocumentObject', tenant)
+        try:
+            obj = collection.query.fetch_object_by_id(doc_uuid)
+            if obj is None:
+                return None
+            return {'uuid': str(obj.uuid), **obj.properties}
+
+        except Exception as e:
+            logger.error(f'Ошибка получения документа {doc_uuid}: {e}')
+
+    def update_document_object(self, doc_uuid: str, tenant: Optional[str] = None, **properties) -> bool:
+        collection = self._collection('DocumentObject', tenant)
+        properties['updated_at'] = datetime.now(ZoneInfo(key='Europe/Moscow')).isoformat()
+
+        try:
+            collection.data.update(uuid=doc_uuid, properties=properties)
+            index_generation.bump()
+            logger.success(f'Документ {doc_uuid} обновлен')
+            return True
+
+        except Exception as e:
+            logger.error(f'Ошибка при обновлении документа: {e}')
+            raise e
+
+    def get_document_chunks(self, doc_uuid: str, tenant: Optional[str] = None,
+                            page_size: int = 1000) -> List[Dict[str, Any]]:
+        collection = self._collection('DocumentChunk', tenant)
+        chunks = []
+        offset = 0
+
+        while True:
+            response = collection.query.fetch_objects(
+                filters=Filter.by_property('document_id').equal(doc_uuid),
+                return_properties=['chunk_hash', 'chunk_index', 'page_number', 'element_type'],
+                limit=page_size,
+                offset=offset
+            )
+            chunks.extend({
+                'uuid': str(obj.uuid),
+                'chunk_hash': obj.properties.get('chunk_hash'),
+                'chunk_index': obj.properties.get('chunk_index'),
+                'page_number': obj.properties.get('page_number'),
+                'element_type': obj.properties.get('element_type'),
+            } for obj in response.objects)
+
+            if len(response.objects) < page_size:
+                return chunks
+            offset += page_size
+
+    def delete_chunks(self, chunk_uuids: List[str], tenant: Optional[str] = None, batch_size: int = 1000):
+        collection = self._collection('DocumentChunk', tenant)
+        for start in range(0, len(chunk_uuids), batch_size):
+            collection.data.delete_many(
+                where=Filter.by_id().contains_any(chunk_uuids[start:start + batch_size])
+            )
+
+        index_generation.bump()
+        logger.info(f'Удалено {len(chunk_uuids)} устаревших чанков')
+
+    def update_chunk_positions(self, positions: Dict[str, Dict[str, Any]], tenant: Optional[str] = None,
+                               page_size: int = 1000):
+        # частичного обновления в батче нет: перечитываем чанки с векторами и перезаписываем целиком
+        collection = self._collection('DocumentChunk', tenant)
+        chunk_uuids = list(positions)
+        failed = 0
+
+        for start in range(0, len(chunk_uuids), page_size):
+            page = chunk_uuids[start:start + page_size]
+            response = collection.query.fetch_objects(
+                filters=Filter.by_id().contains_any(page),
+                include_vector=True,
+                limit=len(page)
+            )
 
+            with self._batch(collection) as batch:
+                for obj in response.objects:
+                    vector = obj.vector.get('default') if isinstance(obj.vector, dict) else obj.vector
+                    batch.add_object(properties={**obj.properties, **positions[str(obj.uuid)]},
+                                     vector=vector, uuid=obj.uuid,
+                                     references={'hasDocument': str(obj.properties['document_id'])})
+            failed += len(collection.batch.failed_objects)
+
+        index_generation.bump()
+        if failed:
+            raise RuntimeError(f'Не удалось обновить позиции {failed} чанков')
+        logger.info(f'Обновлены позиции {len(chunk_uuids)} чанков')
+
+    def _batch(self, collection):
+        if settings.WEAVIATE_BATCH_MODE == 'fixed':
+            return collection.batch.fixed_size(batch_size=settings.WEAVIATE_BATCH_SIZE,
+                                               concurrent_requests=settings.WEAVIATE_BATCH_CONCURRENCY)
+        if settings.WEAVIATE_BATCH_MODE == 'rate':
+            return collection.batch.rate_limit(requests_per_minute=settings.WEAVIATE_BATCH_RATE)
+        if settings.WEAVIATE_BATCH_MODE == 'dynamic':
+            return collection.batch.dynamic()
+        raise ValueError(f'Неизвестный режим батчей: {settings.WEAVIATE_BATCH_MODE}')
+
+    def upsert_chunks_linked(self, chunks_data: List[Dict[str, Any]], vectors: np.ndarray,
+                             doc_uuid: str, tenant: Optional[str] = None,
+                             chunk_uuids: List[str] = None) -> Dict[str, Any]:
+        vectors = np.asarray(vectors, dtype=np.float32)
         if len(chunks_data) != len(vectors):
             raise ValueError(f"Несоответствие размеров: {len(chunks_data)} чанков и "
                              f"{len(vectors)} векторов")
 
-        collection = self.client.collections.get('DocumentChunk')
+        if chunk_uuids is None:
+            occurrences = {}
+            chunk_uuids = []
+            for data in chunks_data:
+                chunk_hash = data.get('chunk_hash') or self.calculate_content_hash(data['content'])
+                chunk_uuids.append(self.chunk_uuid(doc_uuid, chunk_hash, occurrences.get(chunk_hash, 0)))
+                occurrences[chunk_hash] = occurrences.get(chunk_hash, 0) + 1
+
+        collection = self._collection('DocumentChunk', tenant)
+        pending = list(range(len(chunks_data)))
+        sent_bytes = 0
+        start = time.perf_counter()
 
         try:
-            with collection.batch.dynamic() as batch:
-                for i, data in enumerate(chunks_data):
-                    batch.add_object(properties=data, vector=vectors[i],
-                                     references={'hasDocument': doc_uuid})
+            for attempt in range(settings.WEAVIATE_BATCH_RETRIES + 1):
+                with self._batch(collection) as batch:
+                    for i in pending:
+                        batch.add_object(properties={**chunks_data[i], 'document_id': doc_uuid},
+                                         vector=vectors[i], uuid=chunk_uuids[i],
+                                         references={'hasDocument': doc_uuid})
+                        sent_bytes += vectors[i].nbytes + len(chunks_data[i]['content'].encode('utf-8'))
+
+                failed_uuids = {str(obj.object_.uuid) for obj in collection.batch.failed_objects}
+                pending = [i for i in pending if chunk_uuids[i] in failed_uuids]
+                if not pending or attempt == settings.WEAVIATE_BATCH_RETRIES:
+                    break
+
+                delay = settings.WEAVIATE_BATCH_BACKOFF * 2 ** attempt
+                logger.warning(f'Не загружено {len(pending)} чанков, повтор через {delay:.1f} с: '
+                               f'{collection.batch.failed_objects[0].message}')
+                time.sleep(delay)
+
+            index_generation.bump()
+            elapsed = time.perf_counter() - start
+            stats = {
+                'objects': len(chunks_data) - len(pending),
+                'failed': len(pending),
+                'retries': attempt,
+                'seconds': round(elapsed, 3),
+                'objects_per_sec': round((len(chunks_data) - len(pending)) / elapsed, 1) if elapsed else 0,
+                'bytes_sent': sent_bytes
+            }
 
-            if len(collection.batch.failed_objects) > 0:
-                logger.error(f'Ошибка при загрузке: {collection.batch.failed_objects}')
+            if pending:
+                logger.error(f'Ошибка при загрузке {len(pending)} чанков документа {doc_uuid}: '
+                             f'{collection.batch.failed_objects}')
             else:
-                logger.success(f'Успешно загружено {len(chunks_data)} чанков для документа {doc_uuid}')
+                logger.success(f'Успешно загружено {len(chunks_data)} чанков для документа {doc_uuid} '
+                               f'({stats["objects_per_sec"]} объектов/с, {sent_bytes / 2 ** 20:.1f} МБ)')
+            return stats
 
         except Exception as e:
             logger.error(f'Критическая ошибка при загрузке чанков: {e}')
             raise e
 
-    def search(self, vector: list[float], limit: int = 5,
-               include_summary: bool = True) -> List[Dict[str, Any]]:
-        collection = self.client.collections.get('DocumentChunk')
+    def search(self, vector: list[float], limit: int = 5, include_summary: bool = True,
+               tenant: Optional[str] = None) -> List[Dict[str, Any]]:
+        collection = self._collection('DocumentChunk', tenant)
 
         try:
             response = collection.query.near_vector(
                 near_vector=vector,
                 limit=limit,
                 return_metadata=MetadataQuery(distance=True),
-                return_references=[
-                    weaviate.classes.query.QueryReference(
-                        link_on='hasDocument',
-                        return_properties=['filename', 'summary', 'doc_type', 'total_pages']
-                    )
-                ]
+                return_properties=['content', 'page_number', 'chunk_index', 'element_type', 'document_id']
+            )
+
+            parents = self._get_parents(
+                {str(obj.properties['document_id']) for obj in response.objects
+                 if obj.properties.get('document_id')},
+                tenant
             )
 
             results = []
             for obj in response.objects:
-                parent_ref = obj.references.get('hasDocument')
-                parent_doc = parent_ref.objects[0] if parent_ref else None
+                document_id = obj.properties.get('document_id')
+                parent_doc = parents.get(str(document_id)) if document_id else None
 
                 result = {
+                    'uuid': str(obj.uuid),
+                    'document_id': str(document_id) if document_id else None,
                     'content': obj.properties.get('content'),
                     'page_number': obj.properties.get('page_number'),
                     'chunk_index': obj.properties.get('chunk_index'),
                     'element_type': obj.properties.get('element_type'),
                     'score': obj.metadata.distance,
-                    'filename': parent_doc.properties.get('filename') if parent_doc else 'unknown',
-                    'doc_type': parent_doc.properties.get('doc_type') if parent_doc else 'unknown',
+                    'filename': parent_doc.get('filename') if parent_doc else 'unknown',
+                    'doc_type': parent_doc.get('doc_type') if parent_doc else 'unknown',
                 }
 
                 if include_summary and parent_doc:
-                    result['context_summary'] = parent_doc.properties.get('summary', '')
+                    result['context_summary'] = parent_doc.get('summary', '')
 
                 results.append(result)
 
@@ -185,10 +478,32 @@ class VectorStoreManager:
             logger.error(f'Ошибка поиска: {e}')
             return []
 
-    def get_document_stats(self) -> Dict[str, int]:
+    def _get_parents(self, doc_ids: set, tenant: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        parents = {}
+        missing = []
+        for doc_id in doc_ids:
+            cached = self.parent_cache.get((tenant, doc_id))
+            if cached is not None:
+                parents[doc_id] = cached
+            else:
+                missing.append(doc_id)
+
+        if missing:
+            response = self._collection('DocumentObject', tenant).query.fetch_objects(
+                filters=Filter.by_id().contains_any(missing),
+                limit=len(missing),
+                return_properties=['filename', 'summary', 'doc_type', 'total_pages']
+            )
+            for obj in response.objects:
+                parents[str(obj.uuid)] = obj.properties
+                self.parent_cache.put((tenant, str(obj.uuid)), obj.properties)
+
+        return parents
+
+    def get_document_stats(self, tenant: Optional[str] = None) -> Dict[str, int]:
         try:
-            doc_collection = self.client.collections.get('DocumentObject')
-            chunk_collection = self.client.collections.get('DocumentChunk')
+            doc_collection = self._collection('DocumentObject', tenant)
+            chunk_collection = self._collection('DocumentChunk', tenant)
 
             doc_count = doc_collection.aggregate.over_all(total_count=True).total_count
             chunk_count = chunk_collection.aggregate.over_all(total_count=True).total_count
@@ -203,14 +518,15 @@ class VectorStoreManager:
             logger.error(f'Ошибка при получении статистики: {e}')
             return {}
 
-    def delete_document(self, doc_uuid: str)-> bool:
+    def delete_document(self, doc_uuid: str, tenant: Optional[str] = None) -> bool:
         try:
-            chunk_collection = self.client.collections.get('DocumentChunk')
+            chunk_collection = self._collection('DocumentChunk', tenant)
             chunk_collection.data.delete_many(
-                where=Filter.by_ref('hasDocument').by_id().equal(doc_uuid)
+                where=Filter.by_property('document_id').equal(doc_uuid)
             )
-            doc_collection = self.client.collections.get('DocumentObject')
+            doc_collection = self._collection('DocumentObject', tenant)
             doc_collection.data.delete_by_id(doc_uuid)
+            index_generation.bump()
 
             logger.info(f'Документ {doc_uuid} и его чанки удалены')
             return True
@@ -219,6 +535,25 @@ class VectorStoreManager:
             logger.error(f'Ошибка удаления документа: {e}')
             return False
 
+    def list_tenants(self) -> Dict[str, str]:
+        if not self.multi_tenancy:
+            return {}
+        tenants = self.client.collections.get('DocumentObject').tenants.get()
+        return {name: tenant.activity_status.value for name, tenant in tenants.items()}
+
+    def set_tenant_activity(self, tenant: str, status: str = 'INACTIVE'):
+        if not self.multi_tenancy:
+            raise ValueError('Multi-tenancy не включен')
+
+        activity_status = TenantActivityStatus[status.upper()]
+        for name in ('DocumentObject', 'DocumentChunk'):
+            self.client.collections.get(name).tenants.update(
+                tenants=[Tenant(name=tenant, activity_status=activity_status)]
+            )
+
+        index_generation.bump()
+        logger.info(f'Тенант {tenant} переведен в статус {activity_status.value}')
+
     def close(self):
         try:
             self.client.close()
@@ -0,0 +1,122 @@
+import hashlib
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List, Optional, Dict, Any
+
+import numpy as np
+
+from src.config import settings
+
+
+class ContentHasher:
+    def __init__(self):
+        self._sha = hashlib.sha256()
+        self._empty = True
+
+    def update(self, text: str):
+        if not self._empty:
+            self._sha.update(b'\n\n')
+        self._sha.update(text.encode('utf-8'))
+        self._empty = False
+
+    def hexdigest(self) -> str:
+        return self._sha.hexdigest()
+
+
+class BaseVectorStore(ABC):
+    parent_cache = None
+
+    @staticmethod
+    def calculate_content_hash(text: str):
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def chunk_uuid(doc_uuid: str, chunk_hash: str, occurrence: int = 0) -> str:
+        # совпадает с weaviate.util.generate_uuid5(identifier, namespace)
+        return str(uuid.uuid5(uuid.NAMESPACE_DNS, f'{doc_uuid}{chunk_hash}:{occurrence}'))
+
+    @abstractmethod
+    def document_exists(self, content_hash: str, tenant: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def create_document_object(
+            self, filename: str, summary: str, content_hash: str, doc_type: str = 'unknown',
+            file_size: int = 0, total_pages: int = 0, total_chunks: int = 0, tenant: Optional[str] = None
+    ) -> str:
+        ...
+
+    @abstractmethod
+    def get_document(self, doc_uuid: str, tenant: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def update_document_object(self, doc_uuid: str, tenant: Optional[str] = None, **properties) -> bool:
+        ...
+
+    @abstractmethod
+    def get_document_chunks(self, doc_uuid: str, tenant: Optional[str] = None) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def delete_chunks(self, chunk_uuids: List[str], tenant: Optional[str] = None):
+        ...
+
+    @abstractmethod
+    def update_chunk_positions(self, positions: Dict[str, Dict[str, Any]], tenant: Optional[str] = None):
+        ...
+
+    @abstractmethod
+    def upsert_chunks_linked(self, chunks_data: List[Dict[str, Any]], vectors: np.ndarray,
+                             doc_uuid: str, tenant: Optional[str] = None,
+                             chunk_uuids: List[str] = None) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def search(self, vector: list[float], limit: int = 5, include_summary: bool = True,
+               tenant: Optional[str] = None) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def get_document_stats(self, tenant: Optional[str] = None) -> Dict[str, int]:
+        ...
+
+    @abstractmethod
+    def delete_document(self, doc_uuid: str, tenant: Optional[str] = None) -> bool:
+        ...
+
+    @abstractmethod
+    def list_tenants(self) -> Dict[str, str]:
+        ...
+
+    @abstractmethod
+    def set_tenant_activity(self, tenant: str, status: str = 'INACTIVE'):
+        ...
+
+    @abstractmethod
+    def close(self):
+        ...
+
+
+def vector_store_namespace(backend: str = None) -> str:
+    backend = backend or settings.VECTOR_BACKEND
+    if backend == 'local':
+        return f'local:{Path(settings.LOCAL_STORE_DIR).resolve()}'
+    if backend == 'weaviate':
+        return f'weaviate:{settings.WEAVIATE_URL}'
+    return backend
+
+
+def create_vector_store(backend: str = None) -> BaseVectorStore:
+    backend = backend or settings.VECTOR_BACKEND
+
+    if backend == 'weaviate':
+        from src.core.vector_store import VectorStoreManager
+
+        return VectorStoreManager()
+    if backend == 'local':
+        from src.core.local_vector_store import LocalVectorStore
+
+        return LocalVectorStore()
+    raise ValueError(f'Неизвестный бэкенд векторного хранилища: {backend}')